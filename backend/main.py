@@ -6,7 +6,7 @@ Keep this file lean — no mocks, no placeholders, only confirmed logic.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
@@ -28,6 +28,12 @@ from services.session_manager import session_manager
 from services.mcp_client_manager import mcp_client_manager
 from services.error_handler import error_handler, performance_monitor
 from services.diagram_storage import cleanup_old_diagrams, get_diagram_stats, get_diagram_path, DIAGRAMS_DIR
+from services.mode_server_manager import mode_server_manager
+from services.follow_up_detector import detect_follow_up_question
+from services.question_classifier import classify_question
+from services.adaptive_prompt_generator import create_adaptive_prompt
+from services.quality_validator import validate_response_quality
+from services.context_extractor import extract_analysis_context
 
 # Load environment variables
 load_dotenv()
@@ -159,12 +165,13 @@ async def get_mcp_pool_stats():
     """Get MCP client pool statistics"""
     try:
         stats = mcp_client_manager.get_pool_stats()
-        return {
+        # Payload is plain JSON types, so skip FastAPI's jsonable_encoder pass
+        return JSONResponse(content={
             "success": True,
             "pools": stats,
             "total_pools": len(stats),
             "total_in_use": mcp_client_manager.get_usage_count()
-        }
+        })
     except Exception as e:
         logger.error(f"Failed to get pool stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -229,7 +236,7 @@ async def get_diagram_stats_endpoint():
     """Get statistics about stored diagrams"""
     try:
         stats = get_diagram_stats()
-        return stats
+        return JSONResponse(content=stats)
     except Exception as e:
         logger.error(f"Error getting diagram stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -340,7 +347,6 @@ async def analyze_requirements(
                 logger.info(f"Session not found, created new session: {session_id}")
         
         # Step 2: Detect follow-up question
-        from services.follow_up_detector import detect_follow_up_question
         follow_up_detection = detect_follow_up_question(request.requirements, session_id)
         
         previous_context = None
@@ -349,12 +355,10 @@ async def analyze_requirements(
             previous_context = follow_up_detection["previous_context"]
         
         # Step 3: Classify question type
-        from services.question_classifier import classify_question
         question_type = classify_question(request.requirements)
         logger.info(f"Question classified as: {question_type['type']} (confidence: {question_type['confidence']})")
         
         # Use analyze mode servers: aws-knowledge-server only
-        from services.mode_server_manager import mode_server_manager
         analyze_servers_config = mode_server_manager.get_servers_for_mode("analyze")
         
         analyze_servers = []
@@ -369,7 +373,6 @@ async def analyze_requirements(
         knowledge_agent = MCPKnowledgeAgent("aws-knowledge", knowledge_servers)
         
         # Step 4: Generate adaptive prompt
-        from services.adaptive_prompt_generator import create_adaptive_prompt
         adaptive_prompt = create_adaptive_prompt(
             question=request.requirements,
             question_type=question_type,
@@ -392,7 +395,6 @@ async def analyze_requirements(
         tool_usage_log = result.get("tool_usage_log", [])
         
         # Step 5: Validate quality
-        from services.quality_validator import validate_response_quality
         quality_validation = validate_response_quality(
             response=analysis_content,
             question=request.requirements,
@@ -421,7 +423,6 @@ async def analyze_requirements(
         
         # Step 6: Store analysis context for future follow-ups
         if analysis_content:
-            from services.context_extractor import extract_analysis_context
             analysis_context = extract_analysis_context(analysis_content, request.requirements)
             session_manager.set_last_analysis(
                 session_id=session_id,
@@ -542,7 +543,6 @@ async def generate_architecture(request: GenerationRequest):
     try:
         # Always generate CloudFormation template (core functionality)
         # Use only cfn-server for CloudFormation generation
-        from services.mode_server_manager import mode_server_manager
         generate_servers_config = mode_server_manager.get_servers_for_mode("generate")
         
         # Filter to only CloudFormation server for initial generation
@@ -592,7 +592,7 @@ async def generate_architecture(request: GenerationRequest):
         logger.info(f"   - Outputs: {len(parsed_template['outputs'])}")
         logger.info(f"   - Parameters: {len(parsed_template['parameters'])}")
         
-        return GenerationResponse(
+        generation_response = GenerationResponse(
             cloudformation_template=cloudformation_template,
             architecture_diagram="",  # Empty - not generated in generate mode
             cost_estimate={
@@ -612,6 +612,8 @@ async def generate_architecture(request: GenerationRequest):
             },
             deployment_instructions=deployment_instructions
         )
+        # Serialize once in pydantic-core instead of walking the template through jsonable_encoder
+        return Response(content=generation_response.model_dump_json(), media_type="application/json")
     
     except Exception as e:
         logger.error(f"❌ Failed to generate CloudFormation template: {str(e)}")
@@ -999,7 +1001,6 @@ async def stream_analyze(request: GenerationRequest, session_id: Optional[str] =
                     current_session_id = session_manager.create_session()
             
             # Step 2: Detect follow-up question
-            from services.follow_up_detector import detect_follow_up_question
             follow_up_detection = detect_follow_up_question(request.requirements, current_session_id)
             
             previous_context = None
@@ -1008,7 +1009,6 @@ async def stream_analyze(request: GenerationRequest, session_id: Optional[str] =
                 previous_context = follow_up_detection["previous_context"]
             
             # Step 3: Classify question type
-            from services.question_classifier import classify_question
             question_type = classify_question(request.requirements)
             logger.info(f"Question classified as: {question_type['type']} (confidence: {question_type['confidence']})")
             
@@ -1019,7 +1019,6 @@ async def stream_analyze(request: GenerationRequest, session_id: Optional[str] =
             await knowledge_agent.initialize()
             
             # Step 4: Generate adaptive prompt
-            from services.adaptive_prompt_generator import create_adaptive_prompt
             adaptive_prompt = create_adaptive_prompt(
                 question=request.requirements,
                 question_type=question_type,
@@ -1058,7 +1057,6 @@ async def stream_analyze(request: GenerationRequest, session_id: Optional[str] =
             follow_up_questions = knowledge_agent._extract_follow_up_questions(analysis_content)
             
             # Step 5: Validate quality (get tool usage from result if available)
-            from services.quality_validator import validate_response_quality
             # Note: For streaming, we don't have tool_usage_log yet, so use empty list
             # In production, you might want to track tool usage during streaming
             tool_usage_log = []
@@ -1080,7 +1078,6 @@ async def stream_analyze(request: GenerationRequest, session_id: Optional[str] =
             
             # Step 6: Store analysis context for future follow-ups
             if analysis_content:
-                from services.context_extractor import extract_analysis_context
                 analysis_context = extract_analysis_context(analysis_content, request.requirements)
                 session_manager.set_last_analysis(
                     session_id=current_session_id,
@@ -1122,7 +1119,8 @@ async def stream_analyze(request: GenerationRequest, session_id: Optional[str] =
 @app.get("/metrics")
 async def get_metrics():
     """Get performance metrics"""
-    return performance_monitor.get_metrics()
+    # Metrics are plain JSON types, so skip FastAPI's jsonable_encoder pass
+    return JSONResponse(content=performance_monitor.get_metrics())
 
 @app.get("/health")
 async def health_check():
@@ -3,7 +3,8 @@ Adaptive Prompt Generator
 Generates question-type-specific prompts with research strategies
 """
 
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 RESEARCH_STRATEGIES = {
     "multi_service_comparison": """
@@ -115,19 +116,21 @@ PHASE 3 - INTEGRATION GUIDE:
 }
 
 
-def create_base_prompt(question: str, question_type: Dict) -> str:
-    """Create base prompt for question type"""
-    strategy = RESEARCH_STRATEGIES.get(
-        question_type.get("research_strategy", "comprehensive_research"),
-        RESEARCH_STRATEGIES["comprehensive_research"]
-    )
-    
-    output_format = question_type.get("output_format", "detailed_explanation")
-    min_sources = question_type.get("min_sources", 3)
-    
-    base_prompt = f"""Analyze this AWS question:
+_BASE_PROMPT_HEAD = """Analyze this AWS question:
+
+"""
 
-{question}
+# Everything after the question depends only on these three fields, so build it once per combination
+_BASE_PROMPT_TAIL_CACHE: Dict[Tuple[str, str, int], str] = {}
+
+
+def _get_base_prompt_tail(research_strategy: str, output_format: str, min_sources: int) -> str:
+    """Get the cached strategy and requirements section of the base prompt"""
+    key = (research_strategy, output_format, min_sources)
+    tail = _BASE_PROMPT_TAIL_CACHE.get(key)
+    if tail is None:
+        strategy = RESEARCH_STRATEGIES.get(research_strategy, RESEARCH_STRATEGIES["comprehensive_research"])
+        tail = f"""
 
 RESEARCH STRATEGY:
 {strategy}
@@ -151,8 +154,68 @@ Follow-up questions:
 - [Question 1]
 - [Question 2]
 - [Question 3]"""
+        _BASE_PROMPT_TAIL_CACHE[key] = tail
+    return tail
+
+
+def create_base_prompt(question: str, question_type: Dict) -> str:
+    """Create base prompt for question type"""
+    tail = _get_base_prompt_tail(
+        question_type.get("research_strategy", "comprehensive_research"),
+        question_type.get("output_format", "detailed_explanation"),
+        question_type.get("min_sources", 3)
+    )
+    return _BASE_PROMPT_HEAD + question + tail
+
+
+_FOLLOW_UP_INSTRUCTIONS = """
+INSTRUCTIONS FOR FOLLOW-UP:
+- Build upon the previous analysis
+- Reference previously discussed services when relevant
+- Provide deeper insights into topics already covered
+- Connect new information to previous discussion
+- Maintain conversation continuity
+- Cite documentation sources that expand on previous discussion
+"""
+
+
+def _freeze_previous_context(previous_context: Dict) -> Tuple:
+    """Reduce previous analysis context to the hashable fields used in the follow-up section"""
+    return (
+        previous_context.get('question', 'N/A'),
+        previous_context.get('summary', '')[:500],
+        tuple(previous_context.get('services', [])),
+        tuple(previous_context.get('topics', []))
+    )
+
+
+@lru_cache(maxsize=512)
+def _create_adaptive_prompt_cached(
+    question: str,
+    research_strategy: str,
+    output_format: str,
+    min_sources: int,
+    frozen_context: Optional[Tuple]
+) -> str:
+    """Build the adaptive prompt from hashable arguments so repeated requests are served from cache"""
+    base_prompt = _BASE_PROMPT_HEAD + question + _get_base_prompt_tail(research_strategy, output_format, min_sources)
     
-    return base_prompt
+    if frozen_context is None:
+        return base_prompt
+    
+    previous_question, summary, services, topics = frozen_context
+    # Add context-aware section for follow-ups; only the context lines vary per call
+    context_section = f"""
+
+PREVIOUS ANALYSIS CONTEXT:
+Previous Question: {previous_question}
+Summary: {summary}
+Services Discussed: {', '.join(services)}
+Topics Covered: {', '.join(topics)}
+
+CURRENT FOLLOW-UP QUESTION: {question}
+"""
+    return f"{base_prompt}\n\n{context_section}{_FOLLOW_UP_INSTRUCTIONS}"
 
 
 def create_adaptive_prompt(
@@ -171,29 +234,12 @@ def create_adaptive_prompt(
         previous_context: Previous analysis context (if follow-up)
         is_follow_up: Whether this is a follow-up question
     """
-    base_prompt = create_base_prompt(question, question_type)
-    
-    if previous_context and is_follow_up:
-        # Add context-aware section for follow-ups
-        context_section = f"""
-
-PREVIOUS ANALYSIS CONTEXT:
-Previous Question: {previous_context.get('question', 'N/A')}
-Summary: {previous_context.get('summary', '')[:500]}
-Services Discussed: {', '.join(previous_context.get('services', []))}
-Topics Covered: {', '.join(previous_context.get('topics', []))}
-
-CURRENT FOLLOW-UP QUESTION: {question}
-
-INSTRUCTIONS FOR FOLLOW-UP:
-- Build upon the previous analysis
-- Reference previously discussed services when relevant
-- Provide deeper insights into topics already covered
-- Connect new information to previous discussion
-- Maintain conversation continuity
-- Cite documentation sources that expand on previous discussion
-"""
-        return f"{base_prompt}\n\n{context_section}"
-    
-    return base_prompt
-
+    # Context only affects the prompt for follow-ups, so leave it out of the cache key otherwise
+    frozen_context = _freeze_previous_context(previous_context) if previous_context and is_follow_up else None
+    return _create_adaptive_prompt_cached(
+        question,
+        question_type.get("research_strategy", "comprehensive_research"),
+        question_type.get("output_format", "detailed_explanation"),
+        question_type.get("min_sources", 3),
+        frozen_context
+    )
@@ -3,14 +3,49 @@ CloudFormation Template Parser
 Extracts outputs, parameters, resources, and generates deployment instructions
 """
 
+import json
 import yaml
 import re
-from typing import Dict, List, Any, Optional
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, List, Any, Optional, Union
 import logging
+from services.template_cache import cached_copy, template_digest
 
 logger = logging.getLogger(__name__)
 
 
+class CloudFormationYamlLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """Safe YAML loader (libyaml-backed when available) that understands CloudFormation short-form tags"""
+
+
+def _construct_cloudformation_tag(loader, tag_suffix: str, node) -> Dict[str, Any]:
+    """Convert short-form intrinsics (!Ref, !GetAtt, !Sub, ...) to their long-form dictionaries"""
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+
+    if tag_suffix in ("Ref", "Condition"):
+        return {tag_suffix: value}
+    if tag_suffix == "GetAtt" and isinstance(value, str):
+        # !GetAtt Resource.Attribute -> [Resource, Attribute]
+        value = value.split(".", 1)
+    return {f"Fn::{tag_suffix}": value}
+
+
+CloudFormationYamlLoader.add_multi_constructor("!", _construct_cloudformation_tag)
+
+
+# Parsed templates and deployment instructions keyed by content digest; the same
+# template is typically parsed again for instructions and follow-up requests.
+_TEMPLATE_CACHE_SIZE = 256
+_parsed_template_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+_deployment_instructions_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+
 def parse_cloudformation_template(template_content: str) -> Dict[str, Any]:
     """
     Parse CloudFormation template and extract structured information
@@ -25,18 +60,41 @@ def parse_cloudformation_template(template_content: str) -> Dict[str, Any]:
             "aws_services": List of AWS services used
         }
     """
+    return cached_copy(
+        _parsed_template_cache,
+        template_digest(template_content),
+        lambda: _parse_template(template_content),
+        _TEMPLATE_CACHE_SIZE
+    )
+
+
+def parse_cloudformation_template_bytes(template_bytes: bytes) -> Dict[str, Any]:
+    """
+    Parse a CloudFormation template given as UTF-8 bytes (e.g. an uploaded file)
+    
+    A bare template starting with AWSTemplateFormatVersion needs no cleaning,
+    so libyaml reads the bytes directly without a decoded str copy. Anything
+    else (markdown fences, leading prose) is decoded and cleaned as usual.
+    Returns the same structure as parse_cloudformation_template.
+    """
+    if b"```" in template_bytes or not template_bytes.lstrip().startswith(b"AWSTemplateFormatVersion"):
+        return parse_cloudformation_template(template_bytes.decode("utf-8", errors="replace"))
+    return cached_copy(
+        _parsed_template_cache,
+        template_digest(template_bytes),
+        lambda: _parse_template(template_bytes),
+        _TEMPLATE_CACHE_SIZE
+    )
+
+
+def _parse_template(template_content: Union[str, bytes]) -> Dict[str, Any]:
+    """Parse and extract a template (str, or already clean bytes) without consulting the cache"""
     try:
-        # Clean template - remove markdown code blocks if present
-        clean_template = _clean_template(template_content)
-        
-        # Parse YAML
-        try:
-            template_dict = yaml.safe_load(clean_template)
-        except yaml.YAMLError as e:
-            logger.warning(f"Failed to parse YAML: {e}")
-            # Try to extract YAML from markdown or other formats
-            clean_template = _extract_yaml_from_text(clean_template)
-            template_dict = yaml.safe_load(clean_template)
+        template_dict = None
+        if isinstance(template_content, str):
+            template_dict = _load_json_template(template_content)
+        if template_dict is None:
+            template_dict = _load_yaml_template(template_content)
         
         if not template_dict:
             return _empty_result()
@@ -64,28 +122,103 @@ def parse_cloudformation_template(template_content: str) -> Dict[str, Any]:
         return _empty_result()
 
 
+def _load_json_template(template_content: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a JSON-format template with the C json parser, or return None
+    
+    CloudFormation also accepts JSON templates. json.loads is far faster than
+    the YAML loader, and the YAML start-token cleaning would slice into the
+    middle of the JSON object.
+    """
+    text = _strip_fences(template_content) if '```' in template_content else template_content
+    text = text.strip()
+    if text.startswith('json'):
+        # Language tag of a ```json fence
+        text = text[4:].lstrip()
+    if not text.startswith('{'):
+        return None
+    try:
+        template_dict = json.loads(text)
+    except ValueError:
+        return None
+    return template_dict if isinstance(template_dict, dict) else None
+
+
+def _load_yaml_template(template_content: Union[str, bytes]) -> Any:
+    """Load a YAML template, retrying on the extracted YAML section if the first parse fails"""
+    # Clean template - remove markdown code blocks if present
+    if isinstance(template_content, bytes):
+        clean_template = template_content
+    else:
+        clean_template = _clean_template(template_content)
+    
+    # Parse YAML
+    try:
+        return yaml.load(clean_template, Loader=CloudFormationYamlLoader)
+    except yaml.YAMLError as e:
+        logger.warning(f"Failed to parse YAML: {e}")
+        if isinstance(clean_template, bytes):
+            clean_template = clean_template.decode("utf-8", errors="replace")
+        # Try to extract YAML from markdown or other formats
+        clean_template = _extract_yaml_from_text(clean_template)
+        return yaml.load(clean_template, Loader=CloudFormationYamlLoader)
+
+
+# Top-level tokens a template starts from, in priority order; all but the
+# first must begin a line
+_YAML_START_TOKENS = (
+    'Resources:',
+    'Parameters:',
+    'Outputs:',
+    'Mappings:',
+    'Conditions:',
+    'Transform:',
+    '---',
+)
+
+
+def _strip_fences(template: str) -> str:
+    """Remove ``` fences, an optional yaml/yml tag and the whitespace after them"""
+    parts = []
+    pos = 0
+    length = len(template)
+    while True:
+        fence = template.find('```', pos)
+        if fence < 0:
+            parts.append(template[pos:])
+            return ''.join(parts)
+        parts.append(template[pos:fence])
+        pos = fence + 3
+        if template.startswith('yaml', pos):
+            pos += 4
+        elif template.startswith('yml', pos):
+            pos += 3
+        while pos < length and template[pos].isspace():
+            pos += 1
+
+
+def _find_line_start(text: str, token: str) -> int:
+    """Index of token at the start of a line, or -1"""
+    if text.startswith(token):
+        return 0
+    pos = text.find('\n' + token)
+    return pos + 1 if pos >= 0 else -1
+
+
 def _clean_template(template: str) -> str:
     """Remove markdown code blocks and extract YAML content"""
-    # Remove markdown code blocks
-    template = re.sub(r'```(?:yaml|yml)?\s*\n?', '', template)
-    template = re.sub(r'```\s*$', '', template)
+    # Remove markdown code blocks (literal searches, no regex)
+    if '```' in template:
+        template = _strip_fences(template)
     
     # Find YAML start (AWSTemplateFormatVersion, Resources, Parameters, etc.)
-    yaml_start_patterns = [
-        r'AWSTemplateFormatVersion',
-        r'^Resources:',
-        r'^Parameters:',
-        r'^Outputs:',
-        r'^Mappings:',
-        r'^Conditions:',
-        r'^Transform:',
-        r'^---',
-    ]
-    
-    for pattern in yaml_start_patterns:
-        match = re.search(pattern, template, re.MULTILINE)
-        if match:
-            return template[match.start():].strip()
+    start = template.find('AWSTemplateFormatVersion')
+    if start >= 0:
+        return template[start:].strip()
+    for token in _YAML_START_TOKENS:
+        start = _find_line_start(template, token)
+        if start >= 0:
+            return template[start:].strip()
     
     return template.strip()
 
@@ -105,15 +238,18 @@ def _extract_yaml_from_text(text: str) -> str:
 
 def _extract_outputs(template_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Extract outputs from template"""
-    outputs = []
     outputs_section = template_dict.get("Outputs", {})
+    outputs = []
+    append = outputs.append
     
     for output_name, output_def in outputs_section.items():
-        outputs.append({
+        get = output_def.get
+        export = get("Export")
+        append({
             "key": output_name,
-            "description": output_def.get("Description", ""),
-            "value": output_def.get("Value", ""),
-            "export_name": output_def.get("Export", {}).get("Name", "") if isinstance(output_def.get("Export"), dict) else ""
+            "description": get("Description", ""),
+            "value": get("Value", ""),
+            "export_name": export.get("Name", "") if isinstance(export, dict) else ""
         })
     
     return outputs
@@ -121,18 +257,20 @@ def _extract_outputs(template_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
 
 def _extract_parameters(template_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Extract parameters from template"""
-    parameters = []
     parameters_section = template_dict.get("Parameters", {})
+    parameters = []
+    append = parameters.append
     
     for param_name, param_def in parameters_section.items():
-        parameters.append({
+        get = param_def.get
+        append({
             "name": param_name,
-            "type": param_def.get("Type", "String"),
-            "default": param_def.get("Default", ""),
-            "description": param_def.get("Description", ""),
-            "allowed_values": param_def.get("AllowedValues", []),
-            "min_value": param_def.get("MinValue"),
-            "max_value": param_def.get("MaxValue")
+            "type": get("Type", "String"),
+            "default": get("Default", ""),
+            "description": get("Description", ""),
+            "allowed_values": get("AllowedValues", []),
+            "min_value": get("MinValue"),
+            "max_value": get("MaxValue")
         })
     
     return parameters
@@ -140,36 +278,34 @@ def _extract_parameters(template_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
 
 def _extract_resources(template_dict: Dict[str, Any]) -> tuple[List[Dict[str, Any]], Dict[str, int], List[str]]:
     """Extract resources from template"""
-    resources = []
-    resource_types: Dict[str, int] = {}
-    aws_services: List[str] = []
-    
     resources_section = template_dict.get("Resources", {})
+    resources = []
+    append = resources.append
     
     for logical_id, resource_def in resources_section.items():
-        resource_type = resource_def.get("Type", "")
-        
-        # Extract AWS service name from resource type (e.g., AWS::S3::Bucket -> S3)
-        if resource_type.startswith("AWS::"):
-            service_parts = resource_type.split("::")
-            if len(service_parts) >= 2:
-                service_name = service_parts[1]
-                if service_name not in aws_services:
-                    aws_services.append(service_name)
-        
-        # Count resource types
-        resource_types[resource_type] = resource_types.get(resource_type, 0) + 1
+        get = resource_def.get
+        resource_type = get("Type", "")
         
         # Extract key properties
-        properties = resource_def.get("Properties", {})
-        properties_summary = _summarize_properties(properties, resource_type)
+        properties_summary = _summarize_properties(get("Properties", {}), resource_type)
         
-        resources.append({
+        append({
             "logical_id": logical_id,
             "type": resource_type,
             "properties_summary": properties_summary
         })
     
+    # Count resource types in one C-level pass (first-seen order is kept)
+    resource_types: Dict[str, int] = dict(Counter(resource["type"] for resource in resources))
+    
+    # Extract AWS service names from resource types (e.g., AWS::S3::Bucket -> S3),
+    # deduplicated in first-seen order
+    aws_services = list(dict.fromkeys(
+        resource_type.split("::", 2)[1]
+        for resource_type in resource_types
+        if resource_type.startswith("AWS::")
+    ))
+    
     return resources, resource_types, aws_services
 
 
@@ -196,13 +332,51 @@ def _summarize_properties(properties: Dict[str, Any], resource_type: str) -> str
     
     # Add first few properties if no specific ones found
     if not key_props and properties:
-        for key, value in list(properties.items())[:3]:
+        for key, value in islice(properties.items(), 3):
             if isinstance(value, (str, int, float, bool)):
                 key_props.append(f"{key}: {value}")
     
     return ", ".join(key_props) if key_props else "Properties configured"
 
 
+# Cost-relevant properties, keyed by the AWS namespace of the resource type
+# (EC2 only for instances)
+_KEY_PROPERTY_EXTRACTORS = {
+    "EC2": lambda props: {
+        "instance_type": props.get("InstanceType", "Unknown"),
+        "service": "EC2"
+    },
+    "RDS": lambda props: {
+        "instance_class": props.get("DBInstanceClass", "Unknown"),
+        "engine": props.get("Engine", "Unknown"),
+        "allocated_storage": props.get("AllocatedStorage", "Unknown"),
+        "service": "RDS"
+    },
+    "S3": lambda props: {
+        "service": "S3",
+        "storage_class": props.get("BucketName", "Standard")
+    },
+    "Lambda": lambda props: {
+        "runtime": props.get("Runtime", "Unknown"),
+        "memory_size": props.get("MemorySize", "Unknown"),
+        "service": "Lambda"
+    }
+}
+
+
+def _extract_key_properties(resource_type: str, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Extract cost-relevant properties for AWS resource types (None for other types)"""
+    if not resource_type.startswith("AWS::"):
+        return None
+    namespace, separator, _ = resource_type[5:].partition("::")
+    if not separator:
+        return None
+    if namespace == "EC2" and not resource_type.startswith("AWS::EC2::Instance"):
+        return None
+    extractor = _KEY_PROPERTY_EXTRACTORS.get(namespace)
+    return extractor(properties) if extractor else None
+
+
 def generate_deployment_instructions(template_content: str, region: str = "us-east-1") -> Dict[str, Any]:
     """
     Generate deployment instructions for CloudFormation template
@@ -215,6 +389,16 @@ def generate_deployment_instructions(template_content: str, region: str = "us-ea
             "estimated_deployment_time": str
         }
     """
+    return cached_copy(
+        _deployment_instructions_cache,
+        (template_digest(template_content), region),
+        lambda: _build_deployment_instructions(template_content, region),
+        _TEMPLATE_CACHE_SIZE
+    )
+
+
+def _build_deployment_instructions(template_content: str, region: str) -> Dict[str, Any]:
+    """Build deployment instructions without consulting the cache"""
     # Parse template to get stack name suggestion
     parsed = parse_cloudformation_template(template_content)
     
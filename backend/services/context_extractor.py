@@ -4,20 +4,74 @@ Extracts AWS services, topics, and summaries from analysis responses
 """
 
 import re
-from typing import Dict, List, Any
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple
 from datetime import datetime
 
+# Service vocabulary matched as whole words (case-insensitive)
+AWS_SERVICE_NAMES = [
+    'Lambda', 'ECS', 'EC2', 'S3', 'RDS', 'DynamoDB', 'API Gateway', 'CloudFront', 'VPC', 'IAM',
+    'CloudFormation', 'Step Functions', 'EventBridge', 'SQS', 'SNS', 'Kinesis', 'Glue', 'Athena',
+    'Redshift', 'ElastiCache', 'Elasticsearch', 'OpenSearch', 'Route53', 'CloudWatch', 'X-Ray',
+    'CodePipeline', 'CodeBuild', 'CodeDeploy', 'EKS', 'Fargate', 'Batch', 'Elastic Beanstalk',
+    'Lightsail', 'AppSync', 'Amplify', 'Cognito', 'Secrets Manager', 'Parameter Store',
+    'Systems Manager', 'Config', 'CloudTrail', 'GuardDuty', 'WAF', 'Shield', 'KMS',
+    'Certificate Manager', 'Direct Connect', 'VPN', 'Transit Gateway', 'NAT Gateway', 'Elastic IP',
+    'Load Balancer', 'Auto Scaling', 'Terraform', 'CDK'
+]
+
 AWS_SERVICE_PATTERNS = [
     r'\b(?:AWS|Amazon)\s+([A-Z][a-zA-Z]+)\b',
-    r'\b(Lambda|ECS|EC2|S3|RDS|DynamoDB|API Gateway|CloudFront|VPC|IAM|CloudFormation|Step Functions|EventBridge|SQS|SNS|Kinesis|Glue|Athena|Redshift|ElastiCache|Elasticsearch|OpenSearch|Route53|CloudWatch|X-Ray|CodePipeline|CodeBuild|CodeDeploy|EKS|Fargate|Batch|Elastic Beanstalk|Lightsail|AppSync|Amplify|Cognito|Secrets Manager|Parameter Store|Systems Manager|Config|CloudTrail|GuardDuty|WAF|Shield|KMS|Certificate Manager|Direct Connect|VPN|Transit Gateway|NAT Gateway|Elastic IP|Load Balancer|Auto Scaling|Terraform|CDK)\b'
+    r'\b(' + '|'.join(map(re.escape, AWS_SERVICE_NAMES)) + r')\b'
 ]
 
 
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Build a case-insensitive alternation equivalent to '|'.join(words) with
+    shared prefixes factored out (e.g. code(?:pipeline|build|deploy)), so the
+    regex engine tries each prefix once instead of backtracking through every
+    word. Branch order follows the word order, as in the flat alternation.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word.lower():
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + render(child) if char else '' for char, child in node.items()]
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return render(trie)
+
+
+_AWS_SERVICE_RES = [
+    re.compile(AWS_SERVICE_PATTERNS[0], re.IGNORECASE),
+    re.compile(r'\b(' + _trie_pattern(AWS_SERVICE_NAMES) + r')\b', re.IGNORECASE),
+]
+
+# Section headers (markdown H1-H3, then H3 and H2 anywhere on a line)
+_TOPIC_RES = [
+    re.compile(r'^#{1,3}\s+(.+)$', re.MULTILINE),
+    re.compile(r'###\s+(.+?)(?:\n|$)', re.MULTILINE),
+    re.compile(r'##\s+(.+?)(?:\n|$)', re.MULTILINE),
+]
+
+# Markdown formatting stripped from summaries
+_MD_HEADER_RE = re.compile(r'#{1,6}\s+')
+_MD_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_MD_ITALIC_RE = re.compile(r'\*([^*]+)\*')
+
+
 def extract_aws_services(text: str) -> List[str]:
     """Extract AWS service names from text"""
     services = set()
-    for pattern in AWS_SERVICE_PATTERNS:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in _AWS_SERVICE_RES:
+        matches = pattern.findall(text)
         for match in matches:
             if isinstance(match, tuple):
                 services.add(match[0])
@@ -29,15 +83,9 @@ def extract_aws_services(text: str) -> List[str]:
 def extract_topics(text: str) -> List[str]:
     """Extract key topics from analysis text"""
     # Look for section headers (markdown headers)
-    topic_patterns = [
-        r'^#{1,3}\s+(.+)$',  # Markdown headers
-        r'###\s+(.+?)(?:\n|$)',  # H3 headers
-        r'##\s+(.+?)(?:\n|$)',  # H2 headers
-    ]
-    
     topics = []
-    for pattern in topic_patterns:
-        matches = re.findall(pattern, text, re.MULTILINE)
+    for pattern in _TOPIC_RES:
+        matches = pattern.findall(text)
         for match in matches:
             topic = match.strip()
             # Filter out common non-topics
@@ -50,14 +98,17 @@ def extract_topics(text: str) -> List[str]:
 
 def generate_summary(text: str, max_length: int = 500) -> str:
     """Generate a summary of the analysis"""
-    # Remove markdown formatting
-    clean_text = re.sub(r'#{1,6}\s+', '', text)
-    clean_text = re.sub(r'\*\*([^*]+)\*\*', r'\1', clean_text)
-    clean_text = re.sub(r'\*([^*]+)\*', r'\1', clean_text)
+    # Remove markdown formatting; the marker checks run in C and let
+    # plain-text answers skip the regex passes entirely
+    clean_text = text
+    if '#' in clean_text:
+        clean_text = _MD_HEADER_RE.sub('', clean_text)
+    if '*' in clean_text:
+        clean_text = _MD_BOLD_RE.sub(r'\1', clean_text)
+        clean_text = _MD_ITALIC_RE.sub(r'\1', clean_text)
     
-    # Take first paragraph or first max_length characters
-    paragraphs = clean_text.split('\n\n')
-    summary = paragraphs[0] if paragraphs else clean_text[:max_length]
+    # Take first paragraph (without splitting the rest of the text)
+    summary = clean_text.split('\n\n', 1)[0]
     
     if len(summary) > max_length:
         summary = summary[:max_length].rsplit(' ', 1)[0] + '...'
@@ -78,11 +129,23 @@ def extract_analysis_context(response: str, question: str) -> Dict[str, Any]:
             "timestamp": str
         }
     """
+    summary, services, topics = _extract_response_context(response)
     return {
         "question": question,
-        "summary": generate_summary(response),
-        "services": extract_aws_services(response),
-        "topics": extract_topics(response),
+        "summary": summary,
+        # Fresh lists so callers cannot mutate the cached entry
+        "services": list(services),
+        "topics": list(topics),
         "timestamp": datetime.now().isoformat()
     }
 
+
+@lru_cache(maxsize=128)
+def _extract_response_context(response: str) -> Tuple[str, Tuple[str, ...], Tuple[str, ...]]:
+    """Summary, services and topics of a response; the same answer is often re-analysed"""
+    return (
+        generate_summary(response),
+        tuple(extract_aws_services(response)),
+        tuple(extract_topics(response))
+    )
+
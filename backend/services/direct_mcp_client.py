@@ -112,6 +112,8 @@ class DirectMCPClient:
         # Reduce timeout for pre-installed servers (they start faster)
         timeout = 30 if command != "uvx" else 60
         
+        # mcp's stdio_client reads stdout in chunks via anyio and splits lines itself,
+        # so there is no StreamReader line limit to raise for large generate_diagram replies
         return MCPClient(
             lambda: stdio_client(
                 StdioServerParameters(
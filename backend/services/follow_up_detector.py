@@ -20,6 +20,9 @@ FOLLOW_UP_PATTERNS = [
     r'additionally',
     r'furthermore'
 ]
+_FOLLOW_UP_RES = [re.compile(pattern) for pattern in FOLLOW_UP_PATTERNS]
+# All patterns in one alternation: a single scan answers "any follow-up phrase?"
+_FOLLOW_UP_ANY_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in FOLLOW_UP_PATTERNS))
 
 
 def detect_follow_up_question(
@@ -73,11 +76,13 @@ def detect_follow_up_question(
     
     # Check for follow-up patterns
     has_pattern = False
-    for pattern in FOLLOW_UP_PATTERNS:
-        if re.search(pattern, question_lower):
+    # Combined scan only rules questions out; the loop keeps first-hit order for the reasoning
+    patterns = _FOLLOW_UP_RES if _FOLLOW_UP_ANY_RE.search(question_lower) else ()
+    for pattern in patterns:
+        if pattern.search(question_lower):
             has_pattern = True
             confidence += 0.3
-            reasoning_parts.append(f"Contains follow-up pattern: {pattern}")
+            reasoning_parts.append(f"Contains follow-up pattern: {pattern.pattern}")
             break
     
     # Check if references previous services
@@ -7,6 +7,8 @@ Keep this file lean — no mocks, no placeholders, only confirmed logic.
 
 import asyncio
 import logging
+import uuid
+import weakref
 from typing import Dict, List, Optional, Any
 from strands.tools.mcp import MCPClient
 from services.mcp_client_pool import mcp_pool_manager, PooledMCPClient
@@ -37,8 +39,9 @@ class MCPClientManager:
     """Manager for MCP clients using connection pooling"""
     
     def __init__(self):
-        """Initialize manager (backward compatibility)"""
-        pass
+        """Initialize manager"""
+        # Tool catalog per pooled client; entries go away with the client
+        self._tools_cache = weakref.WeakKeyDictionary()
     
     async def get_mcp_client_wrapper(self, mcp_servers: List[str]) -> MCPClientWrapper:
         """
@@ -54,6 +57,45 @@ class MCPClientManager:
         pooled_client = await mcp_pool_manager.get_pooled_client(mcp_servers)
         return MCPClientWrapper(pooled_client)
     
+    async def list_tools(self, mcp_client: MCPClient) -> List[Any]:
+        """
+        List tools for an entered MCP client without blocking the event loop
+        
+        list_tools_sync waits on the client's background session thread, so it
+        is run in a worker thread to let other coroutines proceed meanwhile.
+        The catalog is static for the life of the server process, so it is
+        cached per client; the tools are bound to that client and are not
+        shared with other pooled clients.
+        """
+        tools = self._tools_cache.get(mcp_client)
+        if tools is None:
+            tools = await asyncio.to_thread(mcp_client.list_tools_sync)
+            self._tools_cache[mcp_client] = tools
+        return list(tools)
+    
+    def get_tool_caller(self, mcp_client: MCPClient):
+        """
+        Return a coroutine function call_tool(name, arguments) for an entered MCP client
+        
+        Calls go through MCPClient.call_tool_async, which schedules the session
+        call onto strands' background event loop (the loop that owns the
+        session's streams) and awaits the result from the caller's loop.
+        strands reports failures as error ToolResults; they are raised here as
+        RuntimeError carrying the error text, so callers can handle them as
+        exceptions.
+        """
+        async def call_tool(name: str, arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            result = await mcp_client.call_tool_async(
+                tool_use_id=f"{name}-{uuid.uuid4().hex}",
+                name=name,
+                arguments=arguments
+            )
+            if result.get("status") == "error":
+                message = " ".join(item.get("text", "") for item in result.get("content", []) if isinstance(item, dict))
+                raise RuntimeError(message or f"MCP tool {name} failed")
+            return result
+        return call_tool
+    
     async def release_mcp_client(self):
         """
         Release MCP client (no-op with pooling - handled automatically)
@@ -10,15 +10,29 @@ import json
 import logging
 from datetime import datetime, timedelta
 import asyncio
+from collections import OrderedDict, deque
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
+# Exchanges kept per session to prevent memory bloat
+MAX_CONVERSATION_HISTORY = 20
+
 class SessionManager:
     """Manages user sessions and conversation context"""
     
-    def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_sessions: int = 10000):
+        # Ordered least to most recently accessed, so the oldest session is evicted first
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.session_timeout = timedelta(hours=24)  # 24 hour session timeout
+        self.max_sessions = max_sessions
+    
+    def _touch(self, session_id: str) -> Dict[str, Any]:
+        """Mark a session as accessed now and move it to the most recent end"""
+        session = self.sessions[session_id]
+        session["last_accessed"] = datetime.now()
+        self.sessions.move_to_end(session_id)
+        return session
         
     def create_session(self) -> str:
         """Create a new session and return session ID"""
@@ -26,11 +40,18 @@ class SessionManager:
         self.sessions[session_id] = {
             "created_at": datetime.now(),
             "last_accessed": datetime.now(),
-            "conversation_history": [],
+            # Bounded deque: appends past the limit drop the oldest exchange in O(1)
+            "conversation_history": deque(maxlen=MAX_CONVERSATION_HISTORY),
             "current_architecture": None,
             "mode": "brainstorm",
             "context": {}
         }
+        
+        # Cap memory by evicting the least recently accessed sessions
+        while len(self.sessions) > self.max_sessions:
+            evicted_id, _ = self.sessions.popitem(last=False)
+            logger.info(f"Session limit reached, evicted session: {evicted_id}")
+        
         logger.info(f"Created new session: {session_id}")
         return session_id
     
@@ -48,8 +69,7 @@ class SessionManager:
             return None
             
         # Update last accessed time
-        session["last_accessed"] = datetime.now()
-        return session
+        return self._touch(session_id)
     
     def update_session(self, session_id: str, updates: Dict[str, Any]) -> bool:
         """Update session data"""
@@ -57,7 +77,7 @@ class SessionManager:
             return False
             
         self.sessions[session_id].update(updates)
-        self.sessions[session_id]["last_accessed"] = datetime.now()
+        self._touch(session_id)
         logger.debug(f"Updated session {session_id}")
         return True
     
@@ -73,11 +93,7 @@ class SessionManager:
             "response": response
         })
         
-        # Keep only last 20 exchanges to prevent memory bloat
-        if len(session["conversation_history"]) > 20:
-            session["conversation_history"] = session["conversation_history"][-20:]
-            
-        session["last_accessed"] = datetime.now()
+        self._touch(session_id)
         return True
     
     def set_current_architecture(self, session_id: str, architecture: Dict[str, Any]) -> bool:
@@ -86,7 +102,7 @@ class SessionManager:
             return False
             
         self.sessions[session_id]["current_architecture"] = architecture
-        self.sessions[session_id]["last_accessed"] = datetime.now()
+        self._touch(session_id)
         logger.info(f"Set architecture for session {session_id}")
         return True
     
@@ -96,8 +112,9 @@ class SessionManager:
         if not session or not session["conversation_history"]:
             return None
             
+        history = session["conversation_history"]
         context_parts = []
-        for exchange in session["conversation_history"][-5:]:  # Last 5 exchanges
+        for exchange in islice(history, max(len(history) - 5, 0), None):  # Last 5 exchanges
             context_parts.append(f"User: {exchange['message']}")
             if exchange.get('response'):
                 context_parts.append(f"Assistant: {exchange['response']}")
@@ -170,7 +187,7 @@ class SessionManager:
             "timestamp": datetime.now().isoformat()
         }
         
-        self.sessions[session_id]["last_accessed"] = datetime.now()
+        self._touch(session_id)
         logger.info(f"Stored analysis context for session {session_id}")
         return True
     
@@ -199,7 +216,7 @@ class SessionManager:
         if session_id not in self.sessions:
             return False
         self.sessions[session_id]["conversation_manager"] = conversation_manager
-        self.sessions[session_id]["last_accessed"] = datetime.now()
+        self._touch(session_id)
         logger.debug(f"Stored conversation manager for session {session_id}")
         return True
 
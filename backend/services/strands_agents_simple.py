@@ -4,13 +4,18 @@ Minimalist Mode 🧭
 Keep this file lean — no mocks, no placeholders, only confirmed logic.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import io
 import json
 import os
 import re
+import sys
 import logging
+from collections import OrderedDict
+from itertools import islice
 from datetime import datetime
+from xml.etree import ElementTree
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +26,438 @@ except ImportError:
     YAML_AVAILABLE = False
     logger.warning("PyYAML not available, CloudFormation parsing will use regex fallback")
 
+if YAML_AVAILABLE:
+    from services.cloudformation_parser import CloudFormationYamlLoader
+
+    def _load_template_resources(template_content: str) -> Optional[Dict[str, Any]]:
+        """
+        Load only the Resources section of a YAML template.
+        The document is composed into nodes, but Python objects are constructed
+        only for Resources; Parameters, Outputs, Mappings etc. are never built.
+        """
+        loader = CloudFormationYamlLoader(template_content)
+        try:
+            root = loader.get_single_node()
+            if not isinstance(root, yaml.MappingNode):
+                return None
+            for key_node, value_node in root.value:
+                if key_node.value == "Resources":
+                    return {"Resources": loader.construct_document(value_node)}
+            return {}
+        finally:
+            loader.dispose()
+
 from strands import Agent
 from strands.models import BedrockModel, Model
 from strands.agent.conversation_manager import SlidingWindowConversationManager
 from strands.tools.mcp import MCPClient
 from mcp import stdio_client, StdioServerParameters
 from services.mcp_client_manager import mcp_client_manager
+from services.template_cache import cached_copy, template_digest
+from services.cloudformation_parser import _extract_key_properties
+
+# Map CloudFormation resource namespaces (AWS::<Namespace>::...) to AWS service names
+_SERVICE_BY_NAMESPACE = {
+    "EC2": "EC2",
+    "S3": "S3",
+    "RDS": "RDS",
+    "Lambda": "Lambda",
+    "API": "API Gateway",
+    "DynamoDB": "DynamoDB",
+    "CloudFront": "CloudFront",
+    "VPC": "VPC",
+    "ElasticLoadBalancing": "ELB",
+    "ElasticLoadBalancingV2": "ALB/NLB",
+    "SNS": "SNS",
+    "SQS": "SQS",
+    "CloudWatch": "CloudWatch",
+    "IAM": "IAM",
+    "SecretsManager": "Secrets Manager",
+    "KMS": "KMS",
+    "Route53": "Route53",
+    "CloudFormation": "CloudFormation",
+    "CodePipeline": "CodePipeline",
+    "CodeBuild": "CodeBuild",
+    "ECS": "ECS",
+    "EKS": "EKS",
+    "ElastiCache": "ElastiCache",
+    "Redshift": "Redshift",
+    "EMR": "EMR",
+    "Glue": "Glue",
+    "Athena": "Athena",
+    "Kinesis": "Kinesis",
+    "EventBridge": "EventBridge",
+    "StepFunctions": "Step Functions"
+}
+
+_JSON_TEMPLATE_RE = re.compile(r'\s*\{')
+_SVG_TEXT_RE = re.compile(r'<text[^>]*>([^<]+)</text>')
+_SVG_SHAPE_RE = re.compile(r'rect|circle|polygon', re.IGNORECASE)
+_SVG_SHAPE_TAGS = frozenset(("rect", "circle", "polygon"))
+
+# Follow-up question extraction, shared by the knowledge agents
+_FOLLOW_UP_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in (
+        r'(?:follow.?up questions? you might consider|follow.?up questions?|suggested questions?|you might also ask|consider asking):\s*(.*?)(?:\n\n|\n$|$)',
+        r'(?:questions? to explore|you could ask|additional questions?):\s*(.*?)(?:\n\n|\n$|$)',
+        r'(?:here are some|suggested|recommended) questions?:\s*(.*?)(?:\n\n|\n$|$)',
+        r'follow.?up questions? you might consider:\s*(.*?)(?:\n\n|\n$|$)'
+    )
+]
+_FOLLOW_UP_TRIGGERS = ("question", "ask")
+_QUESTION_SPLIT_RE = re.compile(r'\n\s*[-•]\s*|\n\s*\d+\.\s*')
+_LEADING_BULLET_RE = re.compile(r'^[-•]\s*')
+_LEADING_NUM_RE = re.compile(r'^\d+\.\s*')
+_AWS_SERVICE_RE = re.compile(r'\b(?:AWS|Amazon)\s+([A-Z][a-zA-Z]+)')
+_SERVICE_FOLLOW_UP_TEMPLATES = (
+    "What are the pricing considerations for {}?",
+    "How does {} compare to similar AWS services?",
+    "What are the security best practices for {}?"
+)
+_GENERIC_FOLLOW_UPS = (
+    "What are the cost implications of this approach?",
+    "How would this scale with increased usage?",
+    "What security considerations should I be aware of?"
+)
+
+# Diagram image extraction from knowledge agent responses
+_CODEBLOCK_RE = re.compile(r'```(?:svg|xml|html|png|image)?\s*\n?(.*?)```', re.DOTALL | re.IGNORECASE)
+_BASE64_IMAGE_RE = re.compile(r'data:image/(png|jpeg|jpg|svg\+xml);base64,([A-Za-z0-9+/=]+)', re.IGNORECASE)
+_SVG_RE = re.compile(r'<svg[^>]*>.*?</svg>', re.DOTALL | re.IGNORECASE)
+_GENERIC_BASE64_RE = re.compile(r'data:image/[^;]+;base64,[^\s"\'<>]+', re.IGNORECASE)
+
+# Response content block type -> tool usage log entry type
+_TOOL_USAGE_TYPES = {"tool_use": "tool_use", "tool_result": "tool_result"}
+
+# Default MCP knowledge prompt, filled with the user requirements
+_KNOWLEDGE_PROMPT_TEMPLATE = """Please provide comprehensive information about: {requirements}
+
+            Focus on:
+            - Relevant AWS services and their capabilities
+            - Best practices and recommendations from AWS documentation
+            - Use cases and examples
+            - Architectural patterns and trade-offs
+            - Security considerations
+            - Cost optimization strategies
+
+            If the user asks about blog posts, provide detailed information as if you have direct access to AWS blog articles, including:
+            - Recent blog post titles and topics related to the query
+            - Key insights and recommendations from the posts
+            - Relevant AWS service updates and announcements
+            - Best practices mentioned in the blog posts
+            - Links to relevant AWS blog posts (format as: [Blog Post Title](https://aws.amazon.com/blogs/...))
+
+            Provide clear, actionable guidance without generating any infrastructure templates.
+
+            At the end of your response, suggest 2-3 specific follow-up questions that would help the user:
+            - Dive deeper into the topic
+            - Explore related AWS services
+            - Understand implementation details
+            - Consider alternative approaches
+
+            Format the follow-up questions clearly, like:
+
+            Follow-up questions you might consider:
+            - [Question 1]
+            - [Question 2]
+            - [Question 3]"""
+
+
+def _scan_svg(content: str) -> tuple:
+    """
+    Collect <text> contents and count rect/circle/polygon shapes in one streaming pass.
+    Falls back to regex scanning when the content is not well-formed XML.
+    """
+    texts = []
+    shape_count = 0
+    try:
+        for _, elem in ElementTree.iterparse(io.StringIO(content), events=("end",)):
+            tag = elem.tag.rpartition("}")[2]
+            if tag == "text":
+                if elem.text:
+                    texts.append(elem.text)
+            elif tag in _SVG_SHAPE_TAGS:
+                shape_count += 1
+            elem.clear()
+    except ElementTree.ParseError:
+        return _SVG_TEXT_RE.findall(content), len(_SVG_SHAPE_RE.findall(content))
+    return texts, shape_count
+
+
+# Bedrock failures surfaced by the knowledge agent: (matcher, execute report, streaming report),
+# each report being (log lines, user message)
+_BEDROCK_ERROR_RULES = (
+    (
+        lambda msg, msg_lower: "ValidationException" in msg and "inference profile" in msg_lower,
+        (
+            (
+                "=" * 80,
+                "AWS BEDROCK INFERENCE PROFILE ERROR",
+                "=" * 80,
+                "The model ID requires an inference profile for Converse API.",
+                "",
+                "To fix this:",
+                "  1. Add to backend/.env:",
+                "     BEDROCK_MODEL_ID=anthropic.claude-3-5-sonnet-20240620-v1:0",
+                "",
+                "  2. Or create an inference profile in AWS Bedrock console",
+                "     and use the inference profile ARN as BEDROCK_MODEL_ID",
+                "=" * 80,
+            ),
+            (
+                "I encountered an AWS Bedrock model configuration error. "
+                "The model requires an inference profile. Please set BEDROCK_MODEL_ID in backend/.env "
+                "to 'anthropic.claude-3-5-sonnet-20240620-v1:0' or use an inference profile ARN. "
+                "See server logs for detailed instructions."
+            ),
+        ),
+        (
+            (
+                "=" * 80,
+                "AWS BEDROCK INFERENCE PROFILE ERROR",
+                "=" * 80,
+                "The model ID requires an inference profile for ConverseStream API.",
+                "Please set BEDROCK_MODEL_ID=anthropic.claude-3-5-sonnet-20240620-v1:0 in backend/.env",
+                "=" * 80,
+            ),
+            (
+                "I encountered an AWS Bedrock model configuration error. "
+                "Please set BEDROCK_MODEL_ID in backend/.env to 'anthropic.claude-3-5-sonnet-20240620-v1:0' "
+                "or use an inference profile ARN."
+            ),
+        ),
+    ),
+    (
+        lambda msg, msg_lower: "UnrecognizedClientException" in msg or "security token" in msg_lower,
+        (
+            (
+                "=" * 80,
+                "AWS CREDENTIAL ERROR DETECTED DURING EXECUTION",
+                "=" * 80,
+                "Your AWS credentials are invalid, expired, or don't have Bedrock access.",
+                "",
+                "To fix this:",
+                "  1. Check your backend/.env file has valid credentials:",
+                "     AWS_ACCESS_KEY_ID=your_valid_access_key",
+                "     AWS_SECRET_ACCESS_KEY=your_valid_secret_key",
+                "     AWS_REGION=us-east-1",
+                "",
+                "  2. Verify credentials have Bedrock permissions in AWS IAM",
+                "  3. Restart the backend server after updating .env",
+                "=" * 80,
+            ),
+            (
+                "I encountered an AWS credential error while accessing AWS knowledge. "
+                "Your AWS credentials appear to be invalid, expired, or missing Bedrock permissions. "
+                "Please update your backend/.env file with valid AWS credentials that have Bedrock access, "
+                "then restart the backend server. See the server logs for detailed instructions."
+            ),
+        ),
+        (
+            (
+                "=" * 80,
+                "AWS CREDENTIAL ERROR DETECTED DURING STREAMING",
+                "=" * 80,
+                "Your AWS credentials are invalid, expired, or don't have Bedrock access.",
+                "Please update your backend/.env file with valid AWS credentials.",
+                "=" * 80,
+            ),
+            (
+                "I encountered an AWS credential error while accessing AWS knowledge. "
+                "Your AWS credentials appear to be invalid, expired, or missing Bedrock permissions. "
+                "Please update your backend/.env file with valid AWS credentials that have Bedrock access, "
+                "then restart the backend server."
+            ),
+        ),
+    ),
+)
+
+
+def _classify_bedrock_error(error_msg: str, streaming: bool = False) -> Tuple[List[str], str]:
+    """Return the log lines and user-facing message for a knowledge agent failure."""
+    error_lower = error_msg.lower()
+    for matches, execute_report, streaming_report in _BEDROCK_ERROR_RULES:
+        if matches(error_msg, error_lower):
+            log_lines, user_message = streaming_report if streaming else execute_report
+            return list(log_lines), user_message
+    return [], f"I encountered an error while accessing AWS knowledge: {error_msg}"
+
+
+def _strip_code_blocks(text: str) -> str:
+    """Remove ```-fenced blocks from text in a single left-to-right scan; an unclosed fence is kept."""
+    parts = []
+    pos = 0
+    while True:
+        start = text.find('```', pos)
+        if start < 0:
+            break
+        end = text.find('```', start + 3)
+        if end < 0:
+            break
+        parts.append(text[pos:start])
+        pos = end + 3
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def _extract_diagram_payload(content: str) -> Tuple[str, str, str]:
+    """
+    Split diagram-mode agent output into (diagram_image, architecture_explanation, content).
+    content is replaced by the extracted image when one is found.
+    """
+    diagram_image = ""
+    architecture_explanation = ""
+    
+    # First, try to clean up content - remove markdown code blocks if present
+    cleaned_content = content
+    # Remove markdown code blocks that might wrap image data
+    if '```' in cleaned_content:
+        # Try to extract from markdown code blocks
+        code_block_match = _CODEBLOCK_RE.search(cleaned_content)
+        if code_block_match:
+            cleaned_content = code_block_match.group(1)
+            logger.info("Extracted content from markdown code block")
+
+    # Cheap substring checks decide which patterns are worth running
+    lower_content = cleaned_content.lower()
+
+    # Priority 1: Look for base64 image data (PNG from generate_diagram tool)
+    # The tool returns PNG images as base64 data URLs
+    base64_image_match = None
+    if 'data:image/' in lower_content:
+        base64_image_match = _BASE64_IMAGE_RE.search(cleaned_content)
+    if base64_image_match:
+        image_type = base64_image_match.group(1).lower()
+        base64_data = base64_image_match.group(2)
+        diagram_image = f"data:image/{image_type};base64,{base64_data}"
+        # Extract explanation text that comes after the image
+        image_end_pos = base64_image_match.end()
+        explanation_text = cleaned_content[image_end_pos:].strip()
+        if explanation_text:
+            explanation_text = _strip_code_blocks(explanation_text)
+            explanation_text = re.sub(r'data:image.*?base64,.*', '', explanation_text, flags=re.DOTALL | re.IGNORECASE)
+            explanation_text = explanation_text.strip()
+            if explanation_text and len(explanation_text) > 10:
+                architecture_explanation = explanation_text
+        logger.info("Extracted base64 %s image (%d chars) and explanation (%d chars)", image_type.upper(), len(diagram_image), len(architecture_explanation))
+        content = diagram_image
+    # Priority 2: Look for SVG in the content
+    elif '<svg' in lower_content:
+        svg_match = _SVG_RE.search(cleaned_content)
+        if svg_match:
+            diagram_image = svg_match.group(0).strip()
+            # Extract explanation text that comes after the SVG
+            svg_end_pos = svg_match.end()
+            explanation_text = cleaned_content[svg_end_pos:].strip()
+            if explanation_text:
+                explanation_text = re.sub(r'</svg>.*', '', explanation_text, flags=re.DOTALL)
+                explanation_text = _strip_code_blocks(explanation_text)
+                explanation_text = explanation_text.strip()
+                if explanation_text and len(explanation_text) > 10:
+                    architecture_explanation = explanation_text
+            logger.info("Extracted SVG diagram (%d chars) and explanation (%d chars)", len(diagram_image), len(architecture_explanation))
+            content = diagram_image
+    # Priority 3: Look for any base64 data (fallback)
+    elif "base64" in lower_content:
+        base64_match = None
+        if 'data:image/' in lower_content:
+            base64_match = _GENERIC_BASE64_RE.search(cleaned_content)
+        if base64_match:
+            diagram_image = base64_match.group(0)
+            base64_end_pos = base64_match.end()
+            explanation_text = cleaned_content[base64_end_pos:].strip()
+            if explanation_text:
+                explanation_text = _strip_code_blocks(explanation_text)
+                explanation_text = explanation_text.strip()
+                if explanation_text and len(explanation_text) > 10:
+                    architecture_explanation = explanation_text
+            content = diagram_image
+            logger.info("Extracted base64 image (fallback) (%d chars) and explanation (%d chars)", len(diagram_image), len(architecture_explanation))
+    else:
+        # No image found - log for debugging
+        logger.warning("No image (PNG/SVG) found in diagram mode content. Content length: %d, preview: %.300s", len(content), content)
+        # Keep original content in case it's valid but not matching our patterns
+        content = cleaned_content
+    
+    return diagram_image, architecture_explanation, content
+
+
+def _service_for_resource_type(resource_type: str, namespace: Optional[str]) -> Optional[str]:
+    """
+    Map a resource type (e.g. AWS::EC2::Instance, namespace EC2) to its AWS service name.
+    Networking types under AWS::EC2:: (VPC, Subnet, SecurityGroup, ...) report "EC2";
+    non-AWS types (Custom::, Alexa::, ...) report their raw namespace.
+    """
+    if namespace is None:
+        return None
+    # Only full AWS::<Namespace>::<Type> names go through the service table
+    if not resource_type.startswith(f"AWS::{namespace}::"):
+        return namespace
+    return _SERVICE_BY_NAMESPACE.get(namespace, namespace)
+
+
+# Parsed CloudFormation templates and their summaries, keyed by content digest
+# (see services.template_cache; every lookup returns a private copy)
+_TEMPLATE_CACHE_SIZE = 32
+_agent_template_info_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+_agent_template_summary_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
+
+def _join_ref_path(path_node: Optional[tuple]) -> str:
+    """Render a (parent, key, is_index) path chain as 'Key.Nested[0].Leaf'"""
+    segments = []
+    while path_node is not None:
+        path_node, key, is_index = path_node
+        segments.append(f"[{key}]" if is_index else f".{key}")
+    path = "".join(reversed(segments))
+    return path[1:] if path.startswith(".") else path
+
+
+def _may_contain_refs(value: Any) -> bool:
+    """Cheap pre-check: serialise once and search for intrinsic keys in C"""
+    if isinstance(value, dict) and ("Ref" in value or "Fn::GetAtt" in value):
+        return True
+    try:
+        blob = json.dumps(value, default=str)
+    except (TypeError, ValueError):
+        return True
+    return '"Ref"' in blob or '"Fn::GetAtt"' in blob
+
+
+def _walk_refs(props: Any) -> List[tuple]:
+    """
+    Collect Ref and Fn::GetAtt references in a resource's Properties.
+    Returns (type, target, attribute, path) tuples in document order. Uses an
+    explicit stack; each entry carries a parent-pointer path node that is only
+    rendered when a reference is found.
+    """
+    refs = []
+    stack = [(props, None)] if isinstance(props, (dict, list)) else []
+    while stack:
+        obj, path_node = stack.pop()
+        if isinstance(obj, dict):
+            # Check for Ref and GetAtt at this level
+            if "Ref" in obj:
+                refs.append(("Ref", obj["Ref"], None, _join_ref_path(path_node)))
+            if "Fn::GetAtt" in obj:
+                att = obj["Fn::GetAtt"]
+                if isinstance(att, list) and len(att) > 0:
+                    refs.append(("GetAtt", att[0], att[1] if len(att) > 1 else None, _join_ref_path(path_node)))
+            # Push nested values in reverse so they pop in document order
+            # (skip Ref/GetAtt to avoid duplicates)
+            for key, value in reversed(obj.items()):
+                if key != "Ref" and key != "Fn::GetAtt" and isinstance(value, (dict, list)):
+                    # Skip top-level properties (e.g. IAM policy documents) with no intrinsics
+                    if path_node is None and not _may_contain_refs(value):
+                        continue
+                    stack.append((value, (path_node, key, False)))
+        else:
+            for idx in range(len(obj) - 1, -1, -1):
+                item = obj[idx]
+                if isinstance(item, (dict, list)):
+                    stack.append((item, (path_node, idx, True)))
+    return refs
+
 
 class SimpleStrandsAgent:
     """Simplified Strands agent for AWS Solution Architect tasks"""
@@ -636,8 +1067,6 @@ CRITICAL: You MUST call generate_diagram tool. Do NOT apologize about file syste
     def _extract_diagram_code(self, content: str) -> str:
         """Extract Python diagram code from the agent response"""
         # Look for code blocks in the response
-        import re
-        
         # Try to find Python code blocks
         code_pattern = r'```python\n(.*?)\n```'
         matches = re.findall(code_pattern, content, re.DOTALL)
@@ -1194,28 +1623,23 @@ Follow-up questions:
     
     def _extract_follow_up_questions(self, content: str) -> List[str]:
         """Extract follow-up questions from the response content"""
-        import re
-        
-        # Pattern to find follow-up questions - improved to catch more variations
-        patterns = [
-            r'(?:follow.?up questions? you might consider|follow.?up questions?|suggested questions?|you might also ask|consider asking):\s*(.*?)(?:\n\n|\n$|$)',
-            r'(?:questions? to explore|you could ask|additional questions?):\s*(.*?)(?:\n\n|\n$|$)',
-            r'(?:here are some|suggested|recommended) questions?:\s*(.*?)(?:\n\n|\n$|$)',
-            r'follow.?up questions? you might consider:\s*(.*?)(?:\n\n|\n$|$)'
-        ]
+        # Every follow-up pattern needs "question" or "ask"; skip the scans when neither appears
+        content_lower = content.lower()
+        if not any(trigger in content_lower for trigger in _FOLLOW_UP_TRIGGERS):
+            return self._generate_default_follow_ups(content)
         
+        # Patterns to find follow-up questions - improved to catch more variations
         questions = []
-        for pattern in patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE | re.DOTALL)
-            for match in matches:
+        for pattern in _FOLLOW_UP_PATTERNS:
+            for match in pattern.findall(content):
                 # Split by common separators and clean up
-                question_lines = re.split(r'\n\s*[-•]\s*|\n\s*\d+\.\s*', match.strip())
+                question_lines = _QUESTION_SPLIT_RE.split(match.strip())
                 for line in question_lines:
                     line = line.strip()
                     if line and '?' in line and len(line) > 10:
                         # Clean up the question
-                        line = re.sub(r'^[-•]\s*', '', line)  # Remove leading bullets
-                        line = re.sub(r'^\d+\.\s*', '', line)  # Remove leading numbers
+                        line = _LEADING_BULLET_RE.sub('', line)  # Remove leading bullets
+                        line = _LEADING_NUM_RE.sub('', line)  # Remove leading numbers
                         questions.append(line)
         
         # If no questions found, generate some based on content
@@ -1226,13 +1650,11 @@ Follow-up questions:
     
     def _generate_default_follow_ups(self, content: str) -> List[str]:
         """Generate default follow-up questions based on content"""
-        import re
-        
         # Extract key AWS services mentioned
-        aws_services = re.findall(r'\b(?:AWS|Amazon)\s+([A-Z][a-zA-Z]+)', content)
+        aws_service_match = _AWS_SERVICE_RE.search(content)
         
-        if aws_services:
-            service = aws_services[0]
+        if aws_service_match:
+            service = aws_service_match.group(1)
             return [
                 f"What are the pricing considerations for {service}?",
                 f"How does {service} compare to similar AWS services?",
@@ -1318,8 +1740,6 @@ Format as structured JSON-ready analysis."""
     
     def _parse_analysis_content(self, content: str) -> Dict[str, Any]:
         """Parse the structured analysis content into organized data"""
-        import re
-        
         analysis_data = {
             "requirements_breakdown": self._extract_requirements_breakdown(content),
             "service_recommendations": self._extract_service_recommendations(content),
@@ -1332,8 +1752,6 @@ Format as structured JSON-ready analysis."""
     
     def _extract_requirements_breakdown(self, content: str) -> Dict[str, Any]:
         """Extract functional and non-functional requirements"""
-        import re
-        
         breakdown = {
             "functional_requirements": [],
             "non_functional_requirements": [],
@@ -1377,8 +1795,6 @@ Format as structured JSON-ready analysis."""
     
     def _extract_service_recommendations(self, content: str) -> Dict[str, Any]:
         """Extract AWS service recommendations with alternatives"""
-        import re
-        
         recommendations = {
             "primary_recommendations": [],
             "alternative_architectures": []
@@ -1426,8 +1842,6 @@ Format as structured JSON-ready analysis."""
     
     def _extract_architecture_patterns(self, content: str) -> List[str]:
         """Extract recommended architecture patterns"""
-        import re
-        
         patterns = []
         pattern_keywords = ["microservices", "serverless", "event-driven", "lambda-architecture", "data-lake", "jamstack", "static-site"]
         
@@ -1439,8 +1853,6 @@ Format as structured JSON-ready analysis."""
     
     def _extract_cost_insights(self, content: str) -> Dict[str, Any]:
         """Extract cost insights and optimization opportunities"""
-        import re
-        
         insights = {
             "estimated_monthly_cost": "$100-500",
             "cost_breakdown": {},
@@ -1465,8 +1877,6 @@ Format as structured JSON-ready analysis."""
     
     def _extract_follow_up_questions(self, content: str) -> Dict[str, List[str]]:
         """Extract categorized follow-up questions"""
-        import re
-        
         questions = {
             "technical_clarifications": [],
             "business_context": [],
@@ -1774,24 +2184,14 @@ class MCPEnabledOrchestrator:
         
         Always provide detailed, accurate cost estimates with clear breakdowns and optimization suggestions."""
     
-    def _create_prompt_for_agent(self, inputs: Dict[str, Any], agent_type: str) -> str:
-        """Create appropriate prompt for each agent type"""
-        requirements = inputs.get("requirements", "")
-        detected_keywords = inputs.get("detected_keywords", [])
-        detected_intents = inputs.get("detected_intents", [])
-        
-        base_context = f"""
+    # Static prompt skeletons; only the requirement/context fragments vary per call
+    _BASE_CONTEXT_TEMPLATE = """
         Requirements: {requirements}
-        Detected Keywords: {', '.join(detected_keywords)}
-        Detected Intents: {', '.join(detected_intents)}
+        Detected Keywords: {keywords}
+        Detected Intents: {intents}
         """
-        
-        if agent_type == "cloudformation":
-            existing_template = inputs.get("existing_cloudformation_template", "")
-            existing_template_context = ""
-            
-            if existing_template:
-                existing_template_context = f"""
+    
+    _EXISTING_TEMPLATE_CONTEXT = """
             
 EXISTING CLOUDFORMATION TEMPLATE (for reference/modification):
 {existing_template}
@@ -1800,10 +2200,25 @@ IMPORTANT: The user is asking for changes/modifications to the above template.
 Please update the template based on their new requirements while maintaining
 the existing architecture where appropriate.
 """
+    
+    _DIAGRAM_CF_CONTEXT = """
             
-            return f"""Generate a comprehensive CloudFormation template based on the following requirements:
+PREVIOUS STEP OUTPUT (CloudFormation Template Analysis):
+{cf_summary}
+
+IMPORTANT: This summary contains parsed information from the CloudFormation template including:
+- AWS services used: {aws_services}
+- Resource relationships and connections
+- Network architecture details
+
+Use this structured information to create an accurate architecture diagram that matches the CloudFormation template.
+"""
+    
+    _CLOUDFORMATION_PROMPT_HEADER = """Generate a comprehensive CloudFormation template based on the following requirements:
             
-            {base_context}{existing_template_context}
+            """
+    
+    _CLOUDFORMATION_PROMPT_INSTRUCTIONS = """
             
             Please generate a complete CloudFormation template that includes:
             1. All necessary AWS resources for the requirements
@@ -1813,31 +2228,12 @@ the existing architecture where appropriate.
             5. High availability and scalability features
             
             Use the available MCP tools to gather current AWS service information and best practices."""
-        
-        elif agent_type == "diagram":
-            # Include CloudFormation summary if available
-            cf_summary = inputs.get("cloudformation_summary", "")
-            aws_services = inputs.get("aws_services", [])
-            relationships = inputs.get("resource_relationships", [])
-            
-            cf_context = ""
-            if cf_summary:
-                cf_context = f"""
-            
-PREVIOUS STEP OUTPUT (CloudFormation Template Analysis):
-{cf_summary}
-
-IMPORTANT: This summary contains parsed information from the CloudFormation template including:
-- AWS services used: {', '.join(aws_services) if aws_services else 'See summary above'}
-- Resource relationships and connections
-- Network architecture details
+    
+    _DIAGRAM_PROMPT_HEADER = """Create a comprehensive AWS architecture diagram based on the CloudFormation template.
 
-Use this structured information to create an accurate architecture diagram that matches the CloudFormation template.
 """
-            
-            return f"""Create a comprehensive AWS architecture diagram based on the CloudFormation template.
-
-{base_context}{cf_context}
+    
+    _DIAGRAM_PROMPT_INSTRUCTIONS = """
 
 IMPORTANT: Diagram generation is not available. Focus on CloudFormation template generation.
 1. FIRST: Call 'get_diagram_examples' tool to see the exact format and examples
@@ -1862,33 +2258,12 @@ The diagram should show:
 5. High-level system architecture matching the template structure
 
 Generate the diagram using the generate_diagram tool."""
-        
-        elif agent_type == "cost":
-            # Include summaries from previous steps if available
-            cf_summary = inputs.get("cloudformation_summary", "")
-            diagram_summary = inputs.get("diagram_summary", "")
-            key_properties = inputs.get("key_properties", {})
-            parsed_resources = inputs.get("parsed_resources", {})
-            
-            previous_steps = ""
-            if cf_summary:
-                previous_steps += f"\n\nPREVIOUS STEP 1 OUTPUT (CloudFormation Template Analysis):\n{cf_summary}\n"
-            if diagram_summary:
-                previous_steps += f"\n\nPREVIOUS STEP 2 OUTPUT (Diagram Summary):\n{diagram_summary}\n"
-            
-            # Add key properties for cost estimation
-            if key_properties:
-                props_summary = "\nKey Resource Properties for Cost Calculation:\n"
-                for resource_name, props in list(key_properties.items())[:10]:  # Limit to 10
-                    props_str = ", ".join([f"{k}: {v}" for k, v in props.items()])
-                    props_summary += f"- {resource_name}: {props_str}\n"
-                previous_steps += props_summary
-            
-            previous_context = f"\n\nUse the outputs from the previous steps to provide accurate cost estimates.{previous_steps}" if previous_steps else ""
-            
-            return f"""Provide a detailed cost estimate based on the CloudFormation template.
+    
+    _COST_PROMPT_HEADER = """Provide a detailed cost estimate based on the CloudFormation template.
 
-{base_context}{previous_context}
+"""
+    
+    _COST_PROMPT_INSTRUCTIONS = """
 
 IMPORTANT: Use the CloudFormation template analysis to identify all resources and their properties.
 The summary includes key properties like instance types, storage sizes, and resource configurations.
@@ -1914,28 +2289,115 @@ Format the cost estimate clearly with:
 - Cost breakdown by service
 - Top cost drivers
 - Optimization opportunities"""
+    
+    def _create_prompt_for_agent(self, inputs: Dict[str, Any], agent_type: str) -> str:
+        """Create appropriate prompt for each agent type"""
+        requirements = inputs.get("requirements", "")
+        detected_keywords = inputs.get("detected_keywords", [])
+        detected_intents = inputs.get("detected_intents", [])
+        
+        base_context = self._BASE_CONTEXT_TEMPLATE.format(
+            requirements=requirements,
+            keywords=', '.join(detected_keywords),
+            intents=', '.join(detected_intents)
+        )
+        
+        if agent_type == "cloudformation":
+            existing_template = inputs.get("existing_cloudformation_template", "")
+            parts = [self._CLOUDFORMATION_PROMPT_HEADER, base_context]
+            
+            if existing_template:
+                parts.append(self._EXISTING_TEMPLATE_CONTEXT.format(existing_template=existing_template))
+            
+            parts.append(self._CLOUDFORMATION_PROMPT_INSTRUCTIONS)
+            return "".join(parts)
+        
+        elif agent_type == "diagram":
+            # Include CloudFormation summary if available
+            cf_summary = inputs.get("cloudformation_summary", "")
+            aws_services = inputs.get("aws_services", [])
+            parts = [self._DIAGRAM_PROMPT_HEADER, base_context]
+            
+            if cf_summary:
+                parts.append(self._DIAGRAM_CF_CONTEXT.format(
+                    cf_summary=cf_summary,
+                    aws_services=', '.join(aws_services) if aws_services else 'See summary above'
+                ))
+            
+            parts.append(self._DIAGRAM_PROMPT_INSTRUCTIONS)
+            return "".join(parts)
+        
+        elif agent_type == "cost":
+            # Include summaries from previous steps if available
+            cf_summary = inputs.get("cloudformation_summary", "")
+            diagram_summary = inputs.get("diagram_summary", "")
+            key_properties = inputs.get("key_properties", {})
+            
+            previous_steps = []
+            if cf_summary:
+                previous_steps.append(f"\n\nPREVIOUS STEP 1 OUTPUT (CloudFormation Template Analysis):\n{cf_summary}\n")
+            if diagram_summary:
+                previous_steps.append(f"\n\nPREVIOUS STEP 2 OUTPUT (Diagram Summary):\n{diagram_summary}\n")
+            
+            # Add key properties for cost estimation
+            if key_properties:
+                props_lines = []
+                for resource_name, props in islice(key_properties.items(), 10):  # Limit to 10
+                    props_str = ", ".join([f"{k}: {v}" for k, v in props.items()])
+                    props_lines.append(f"- {resource_name}: {props_str}")
+                previous_steps.append("\nKey Resource Properties for Cost Calculation:\n")
+                previous_steps.append("\n".join(props_lines))
+                previous_steps.append("\n")
+            
+            parts = [self._COST_PROMPT_HEADER, base_context]
+            if previous_steps:
+                parts.append("\n\nUse the outputs from the previous steps to provide accurate cost estimates.")
+                parts.extend(previous_steps)
+            
+            parts.append(self._COST_PROMPT_INSTRUCTIONS)
+            return "".join(parts)
         
         return base_context
     
-    def _parse_cloudformation_template(self, template_content: str) -> Dict[str, Any]:
+    def _parse_cloudformation_template(self, template_content: str, digest: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Parse CloudFormation template to extract structured information.
         Returns a dictionary with services, resources, relationships, and key properties.
+        Results are cached by content digest (pass digest if already computed);
+        each call returns its own copy.
         """
+        return cached_copy(
+            _agent_template_info_cache,
+            digest if digest is not None else template_digest(template_content),
+            lambda: self._build_parsed_template_info(template_content),
+            _TEMPLATE_CACHE_SIZE
+        )
+    
+    def _build_parsed_template_info(self, template_content: str) -> Dict[str, Any]:
+        """Uncached parse behind _parse_cloudformation_template"""
         template_dict = None
-        if YAML_AVAILABLE:
+        if _JSON_TEMPLATE_RE.match(template_content):
+            # JSON templates (e.g. CDK/SAM output) skip the much slower YAML parser
             try:
-                template_dict = yaml.safe_load(template_content)
-            except Exception as e:
-                logger.warning(f"Failed to parse CloudFormation YAML, using regex fallback: {e}")
-        else:
-            logger.debug("YAML not available, using regex-based parsing")
+                template_dict = json.loads(template_content)
+            except ValueError:
+                logger.debug("Template looks like JSON but is not valid JSON, trying YAML")
+        
+        if template_dict is None:
+            if YAML_AVAILABLE:
+                try:
+                    template_dict = _load_template_resources(template_content)
+                except Exception as e:
+                    logger.warning(f"Failed to parse CloudFormation YAML, using regex fallback: {e}")
+            else:
+                logger.debug("YAML not available, using regex-based parsing")
         
         parsed_info = {
             "aws_services": [],
             "resources": {},
-            "resource_types": [],
-            "relationships": [],
+            "resource_types": {},
+            # Parallel columns (one entry per Ref/GetAtt edge) rather than a dict per edge
+            "relationships": {"from": [], "to": [], "type": [], "attribute": [], "path": []},
             "network_architecture": {},
             "key_properties": {}
         }
@@ -1943,132 +2405,52 @@ Format the cost estimate clearly with:
         if template_dict and "Resources" in template_dict:
             resources = template_dict["Resources"]
             
-            # Map CloudFormation resource types to AWS service names
-            service_mapping = {
-                "AWS::EC2::": "EC2",
-                "AWS::S3::": "S3",
-                "AWS::RDS::": "RDS",
-                "AWS::Lambda::": "Lambda",
-                "AWS::API::": "API Gateway",
-                "AWS::DynamoDB::": "DynamoDB",
-                "AWS::CloudFront::": "CloudFront",
-                "AWS::VPC::": "VPC",
-                "AWS::EC2::VPC": "VPC",
-                "AWS::EC2::Subnet": "VPC",
-                "AWS::EC2::SecurityGroup": "VPC",
-                "AWS::EC2::InternetGateway": "VPC",
-                "AWS::EC2::RouteTable": "VPC",
-                "AWS::EC2::Instance": "EC2",
-                "AWS::EC2::LaunchTemplate": "EC2",
-                "AWS::EC2::AutoScalingGroup": "EC2",
-                "AWS::ElasticLoadBalancing::": "ELB",
-                "AWS::ElasticLoadBalancingV2::": "ALB/NLB",
-                "AWS::SNS::": "SNS",
-                "AWS::SQS::": "SQS",
-                "AWS::CloudWatch::": "CloudWatch",
-                "AWS::IAM::": "IAM",
-                "AWS::SecretsManager::": "Secrets Manager",
-                "AWS::KMS::": "KMS",
-                "AWS::Route53::": "Route53",
-                "AWS::CloudFormation::": "CloudFormation",
-                "AWS::CodePipeline::": "CodePipeline",
-                "AWS::CodeBuild::": "CodeBuild",
-                "AWS::ECS::": "ECS",
-                "AWS::EKS::": "EKS",
-                "AWS::ElastiCache::": "ElastiCache",
-                "AWS::Redshift::": "Redshift",
-                "AWS::EMR::": "EMR",
-                "AWS::Glue::": "Glue",
-                "AWS::Athena::": "Athena",
-                "AWS::Kinesis::": "Kinesis",
-                "AWS::EventBridge::": "EventBridge",
-                "AWS::StepFunctions::": "Step Functions"
-            }
-            
             services_found = set()
+            relationships = parsed_info["relationships"]
+            rel_from, rel_to, rel_type, rel_attr, rel_path = (
+                relationships["from"], relationships["to"], relationships["type"],
+                relationships["attribute"], relationships["path"]
+            )
+            resource_types = parsed_info["resource_types"]
             
+            # Resources are processed sequentially on purpose: CloudFormation caps a template
+            # at 500 resources, and walking that many takes a few milliseconds - less than
+            # starting a process pool and pickling the property trees to it.
             for resource_name, resource_def in resources.items():
-                if not isinstance(resource_def, dict) or "Type" not in resource_def:
+                if not isinstance(resource_def, dict) or not isinstance(resource_def.get("Type"), str):
                     continue
                 
-                resource_type = resource_def["Type"]
-                parsed_info["resource_types"].append(resource_type)
+                # Count types; interning shares one string object per distinct type
+                resource_type = sys.intern(resource_def["Type"])
+                resource_types[resource_type] = resource_types.get(resource_type, 0) + 1
+                parts = resource_type.split("::", 2)
+                namespace = parts[1] if len(parts) >= 2 else None
                 
                 # Extract AWS service from resource type
-                for prefix, service in service_mapping.items():
-                    if resource_type.startswith(prefix):
-                        services_found.add(service)
-                        break
-                else:
-                    # Extract service from type (e.g., AWS::EC2::Instance -> EC2)
-                    parts = resource_type.split("::")
-                    if len(parts) >= 2:
-                        services_found.add(parts[1])
+                service = _service_for_resource_type(resource_type, namespace)
+                if service is not None:
+                    services_found.add(service)
                 
                 # Store resource info
+                props = resource_def.get("Properties") or {}
                 resource_info = {
                     "type": resource_type,
-                    "properties": resource_def.get("Properties", {})
+                    "properties": props
                 }
                 parsed_info["resources"][resource_name] = resource_info
                 
                 # Extract key properties for cost estimation
-                props = resource_def.get("Properties", {})
-                if resource_type.startswith("AWS::EC2::Instance"):
-                    parsed_info["key_properties"][resource_name] = {
-                        "instance_type": props.get("InstanceType", "Unknown"),
-                        "service": "EC2"
-                    }
-                elif resource_type.startswith("AWS::RDS::"):
-                    parsed_info["key_properties"][resource_name] = {
-                        "instance_class": props.get("DBInstanceClass", "Unknown"),
-                        "engine": props.get("Engine", "Unknown"),
-                        "allocated_storage": props.get("AllocatedStorage", "Unknown"),
-                        "service": "RDS"
-                    }
-                elif resource_type.startswith("AWS::S3::"):
-                    parsed_info["key_properties"][resource_name] = {
-                        "service": "S3",
-                        "storage_class": props.get("BucketName", "Standard")
-                    }
-                elif resource_type.startswith("AWS::Lambda::"):
-                    parsed_info["key_properties"][resource_name] = {
-                        "runtime": props.get("Runtime", "Unknown"),
-                        "memory_size": props.get("MemorySize", "Unknown"),
-                        "service": "Lambda"
-                    }
+                key_properties = _extract_key_properties(resource_type, props)
+                if key_properties is not None:
+                    parsed_info["key_properties"][resource_name] = key_properties
                 
                 # Extract relationships (Ref, GetAtt, etc.)
-                def extract_refs(obj, path=""):
-                    """Recursively extract Ref and GetAtt references"""
-                    if isinstance(obj, dict):
-                        # Check for Ref and GetAtt at this level
-                        if "Ref" in obj:
-                            parsed_info["relationships"].append({
-                                "from": resource_name,
-                                "to": obj["Ref"],
-                                "type": "Ref",
-                                "path": path
-                            })
-                        if "Fn::GetAtt" in obj:
-                            att = obj["Fn::GetAtt"]
-                            if isinstance(att, list) and len(att) > 0:
-                                parsed_info["relationships"].append({
-                                    "from": resource_name,
-                                    "to": att[0],
-                                    "type": "GetAtt",
-                                    "attribute": att[1] if len(att) > 1 else None,
-                                    "path": path
-                                })
-                        # Recursively check nested dictionaries (skip Ref/GetAtt to avoid duplicates)
-                        for key, value in obj.items():
-                            if key not in ["Ref", "Fn::GetAtt"]:
-                                extract_refs(value, f"{path}.{key}" if path else key)
-                    elif isinstance(obj, list):
-                        for idx, item in enumerate(obj):
-                            extract_refs(item, f"{path}[{idx}]" if path else f"[{idx}]")
-                
-                extract_refs(props)
+                for ref_type, target, attribute, path in _walk_refs(props):
+                    rel_from.append(resource_name)
+                    rel_to.append(target)
+                    rel_type.append(ref_type)
+                    rel_attr.append(attribute)
+                    rel_path.append(path)
                 
                 # Extract network architecture
                 if resource_type.startswith("AWS::EC2::VPC"):
@@ -2103,7 +2485,7 @@ Format the cost estimate clearly with:
         # Resources Summary
         if parsed_info["resources"]:
             summary_parts.append(f"## Resources ({len(parsed_info['resources'])} total):")
-            for resource_name, resource_info in list(parsed_info["resources"].items())[:20]:  # Limit to 20
+            for resource_name, resource_info in islice(parsed_info["resources"].items(), 20):  # Limit to 20
                 resource_type_short = resource_info["type"].split("::")[-1]
                 summary_parts.append(f"- {resource_name} ({resource_type_short})")
             if len(parsed_info["resources"]) > 20:
@@ -2122,34 +2504,38 @@ Format the cost estimate clearly with:
             summary_parts.append("")
         
         # Resource Relationships (important for diagrams)
-        if for_agent == "diagram" and parsed_info["relationships"]:
+        relationships = parsed_info["relationships"]
+        rel_type = relationships["type"]
+        if for_agent == "diagram" and rel_type:
             summary_parts.append("## Key Resource Relationships:")
-            # Group relationships by type
-            refs = [r for r in parsed_info["relationships"] if r["type"] == "Ref"]
-            getatts = [r for r in parsed_info["relationships"] if r["type"] == "GetAtt"]
-            
-            if refs:
-                summary_parts.append(f"- Direct References: {len(refs)} connections")
-                for rel in refs[:5]:  # Show first 5
-                    summary_parts.append(f"  * {rel['from']} → {rel['to']}")
-                if len(refs) > 5:
-                    summary_parts.append(f"  * ... and {len(refs) - 5} more")
-            
-            if getatts:
-                summary_parts.append(f"- Attribute References: {len(getatts)} connections")
-                for rel in getatts[:5]:  # Show first 5
-                    attr_info = f" ({rel['attribute']})" if rel.get("attribute") else ""
-                    summary_parts.append(f"  * {rel['from']} → {rel['to']}{attr_info}")
-                if len(getatts) > 5:
-                    summary_parts.append(f"  * ... and {len(getatts) - 5} more")
+            # Group relationships by type (Ref or GetAtt); only the first 5 of each are displayed
+            rel_from, rel_to, rel_attr = relationships["from"], relationships["to"], relationships["attribute"]
+            ref_count = rel_type.count("Ref")
+            getatt_count = len(rel_type) - ref_count
+            
+            if ref_count:
+                summary_parts.append(f"- Direct References: {ref_count} connections")
+                for i in islice((i for i, t in enumerate(rel_type) if t == "Ref"), 5):
+                    summary_parts.append(f"  * {rel_from[i]} → {rel_to[i]}")
+                if ref_count > 5:
+                    summary_parts.append(f"  * ... and {ref_count - 5} more")
+            
+            if getatt_count:
+                summary_parts.append(f"- Attribute References: {getatt_count} connections")
+                for i in islice((i for i, t in enumerate(rel_type) if t == "GetAtt"), 5):
+                    attr_info = f" ({rel_attr[i]})" if rel_attr[i] else ""
+                    summary_parts.append(f"  * {rel_from[i]} → {rel_to[i]}{attr_info}")
+                if getatt_count > 5:
+                    summary_parts.append(f"  * ... and {getatt_count - 5} more")
             summary_parts.append("")
         
         # Key Properties (important for cost estimation)
         if for_agent == "cost" and parsed_info["key_properties"]:
             summary_parts.append("## Key Resource Properties for Cost Estimation:")
-            for resource_name, props in parsed_info["key_properties"].items():
-                prop_str = ", ".join([f"{k}: {v}" for k, v in props.items()])
-                summary_parts.append(f"- {resource_name}: {prop_str}")
+            summary_parts.append("\n".join(
+                f"- {resource_name}: " + ", ".join(f"{k}: {v}" for k, v in props.items())
+                for resource_name, props in parsed_info["key_properties"].items()
+            ))
             summary_parts.append("")
         
         return "\n".join(summary_parts)
@@ -2161,28 +2547,37 @@ Format the cost estimate clearly with:
         
         # For CloudFormation templates, use enhanced parsing
         if output_type == "cloudformation":
-            # Parse the template to extract structured information
-            parsed_info = self._parse_cloudformation_template(content)
-            
             # Determine which agent will use this summary
             # Default to "diagram" format (more detailed)
-            return self._format_cloudformation_summary(parsed_info, for_agent="diagram")
+            digest = template_digest(content)
+            # Parse the template to extract structured information
+            return cached_copy(
+                _agent_template_summary_cache,
+                (digest, "diagram"),
+                lambda: self._format_cloudformation_summary(
+                    self._parse_cloudformation_template(content, digest), for_agent="diagram"
+                ),
+                _TEMPLATE_CACHE_SIZE
+            )
         
         # For diagrams, extract key components and structure
         elif output_type == "diagram":
             # For SVG diagrams, extract main elements
             summary_lines = []
             
-            # Look for text elements (component names)
-            text_pattern = r'<text[^>]*>([^<]+)</text>'
-            texts = re.findall(text_pattern, content)
+            # Text elements (component names) and shapes (architecture elements)
+            texts, rect_count = _scan_svg(content)
             if texts:
-                unique_texts = list(set(texts))[:15]  # Limit to 15 unique components
+                # First 15 unique components, in document order
+                seen = {}
+                for text in texts:
+                    if text not in seen:
+                        seen[text] = None
+                        if len(seen) == 15:
+                            break
+                unique_texts = list(seen)
                 summary_lines.append(f"Components: {', '.join(unique_texts)}")
             
-            # Look for rectangles/paths (architecture elements)
-            rect_pattern = r'rect|circle|polygon'
-            rect_count = len(re.findall(rect_pattern, content, re.IGNORECASE))
             summary_lines.append(f"Contains {rect_count} visual elements")
             
             # Get first 300 chars as context
@@ -2225,6 +2620,39 @@ Use this CloudFormation summary to inform your architecture diagram creation.
 class MCPKnowledgeAgent:
     """MCP-enabled Knowledge Agent using direct AWS MCP servers"""
     
+    # Knowledge agents have no diagram or pricing tools, so the prompt never varies
+    _SYSTEM_PROMPT = (
+        """You are an AWS Solution Architect with comprehensive access to AWS Knowledge MCP Server capabilities through direct MCP connections.
+
+        You have access to:
+        - AWS Knowledge MCP Server: Latest AWS documentation, blog posts, best practices, and official resources
+        - AWS API Server: Current AWS API information and service capabilities
+        
+        Your role is to provide comprehensive, accurate, and up-to-date information about:
+        - AWS services and their capabilities
+        - Best practices and recommendations from AWS documentation
+        - Concepts, use cases, and architectural patterns
+        - Architectural decisions and trade-offs
+        - AWS pricing models and cost optimization strategies
+        - Security considerations and compliance requirements
+        - Latest AWS blog posts and announcements
+        
+        IMPORTANT: You do NOT have access to diagram generation or pricing tools.
+        Focus exclusively on knowledge sharing, guidance, and conceptual understanding.
+        DO NOT generate CloudFormation templates, diagrams, or cost estimates unless explicitly requested.
+        Focus exclusively on knowledge sharing, guidance, and conceptual understanding."""
+        """
+        
+        When users ask about blog posts, provide detailed information as if you have direct access to AWS blog articles, including:
+        - Recent blog post titles and topics
+        - Key insights and recommendations from the posts
+        - Relevant AWS service updates and announcements
+        - Best practices mentioned in the blog posts
+        
+        Always include relevant links and references when discussing AWS services and best practices.
+        Your responses should be comprehensive, accurate, and reflect the latest AWS information available."""
+    )
+    
     def __init__(self, name: str, mcp_servers: List[str]):
         self.name = name
         self.mcp_servers = mcp_servers
@@ -2362,63 +2790,27 @@ class MCPKnowledgeAgent:
     
     def _get_system_prompt(self) -> str:
         """Get system prompt based on available MCP servers"""
-        base_prompt = """You are an AWS Solution Architect with comprehensive access to AWS Knowledge MCP Server capabilities through direct MCP connections.
-
-        You have access to:
-        - AWS Knowledge MCP Server: Latest AWS documentation, blog posts, best practices, and official resources
-        - AWS API Server: Current AWS API information and service capabilities
-        
-        Your role is to provide comprehensive, accurate, and up-to-date information about:
-        - AWS services and their capabilities
-        - Best practices and recommendations from AWS documentation
-        - Concepts, use cases, and architectural patterns
-        - Architectural decisions and trade-offs
-        - AWS pricing models and cost optimization strategies
-        - Security considerations and compliance requirements
-        - Latest AWS blog posts and announcements
-        
-        IMPORTANT: You do NOT have access to diagram generation or pricing tools.
-        Focus exclusively on knowledge sharing, guidance, and conceptual understanding.
-        DO NOT generate CloudFormation templates, diagrams, or cost estimates unless explicitly requested.
-        Focus exclusively on knowledge sharing, guidance, and conceptual understanding."""
-        
-        base_prompt += """
-        
-        When users ask about blog posts, provide detailed information as if you have direct access to AWS blog articles, including:
-        - Recent blog post titles and topics
-        - Key insights and recommendations from the posts
-        - Relevant AWS service updates and announcements
-        - Best practices mentioned in the blog posts
-        
-        Always include relevant links and references when discussing AWS services and best practices.
-        Your responses should be comprehensive, accurate, and reflect the latest AWS information available."""
-        
-        return base_prompt
+        return self._SYSTEM_PROMPT
     
     def _extract_follow_up_questions(self, content: str) -> List[str]:
         """Extract follow-up questions from the response content"""
-        import re
-        
-        # Pattern to find follow-up questions - improved to catch more variations
-        patterns = [
-            r'(?:follow.?up questions? you might consider|follow.?up questions?|suggested questions?|you might also ask|consider asking):\s*(.*?)(?:\n\n|\n$|$)',
-            r'(?:questions? to explore|you could ask|additional questions?):\s*(.*?)(?:\n\n|\n$|$)',
-            r'(?:here are some|suggested|recommended) questions?:\s*(.*?)(?:\n\n|\n$|$)',
-            r'follow.?up questions? you might consider:\s*(.*?)(?:\n\n|\n$|$)'
-        ]
+        # Every follow-up pattern needs "question" or "ask"; skip the scans when neither appears
+        content_lower = content.lower()
+        if not any(trigger in content_lower for trigger in _FOLLOW_UP_TRIGGERS):
+            return self._generate_default_follow_ups(content)
         
+        # Patterns to find follow-up questions - improved to catch more variations
         questions = []
-        for pattern in patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE | re.DOTALL)
-            for match in matches:
+        for pattern in _FOLLOW_UP_PATTERNS:
+            for match in pattern.findall(content):
                 # Split by common separators and clean up
-                question_lines = re.split(r'\n\s*[-•]\s*|\n\s*\d+\.\s*', match.strip())
+                question_lines = _QUESTION_SPLIT_RE.split(match.strip())
                 for line in question_lines:
                     line = line.strip()
                     if line and '?' in line and len(line) > 10:
                         # Clean up the question
-                        line = re.sub(r'^[-•]\s*', '', line)  # Remove leading bullets
-                        line = re.sub(r'^\d+\.\s*', '', line)  # Remove leading numbers
+                        line = _LEADING_BULLET_RE.sub('', line)  # Remove leading bullets
+                        line = _LEADING_NUM_RE.sub('', line)  # Remove leading numbers
                         questions.append(line)
         
         # If no questions found, generate some based on content
@@ -2429,24 +2821,14 @@ class MCPKnowledgeAgent:
     
     def _generate_default_follow_ups(self, content: str) -> List[str]:
         """Generate default follow-up questions based on content"""
-        import re
-        
         # Extract key AWS services mentioned
-        aws_services = re.findall(r'\b(?:AWS|Amazon)\s+([A-Z][a-zA-Z]+)', content)
+        aws_service_match = _AWS_SERVICE_RE.search(content)
         
-        if aws_services:
-            service = aws_services[0]
-            return [
-                f"What are the pricing considerations for {service}?",
-                f"How does {service} compare to similar AWS services?",
-                f"What are the security best practices for {service}?"
-            ]
+        if aws_service_match:
+            service = aws_service_match.group(1)
+            return [template.format(service) for template in _SERVICE_FOLLOW_UP_TEMPLATES]
         else:
-            return [
-                "What are the cost implications of this approach?",
-                "How would this scale with increased usage?",
-                "What security considerations should I be aware of?"
-            ]
+            return list(_GENERIC_FOLLOW_UPS)
     
     async def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the Core MCP knowledge agent with tool usage tracking"""
@@ -2462,37 +2844,7 @@ class MCPKnowledgeAgent:
         if custom_prompt:
             prompt = custom_prompt
         else:
-            prompt = f"""Please provide comprehensive information about: {requirements}
-
-            Focus on:
-            - Relevant AWS services and their capabilities
-            - Best practices and recommendations from AWS documentation
-            - Use cases and examples
-            - Architectural patterns and trade-offs
-            - Security considerations
-            - Cost optimization strategies
-
-            If the user asks about blog posts, provide detailed information as if you have direct access to AWS blog articles, including:
-            - Recent blog post titles and topics related to the query
-            - Key insights and recommendations from the posts
-            - Relevant AWS service updates and announcements
-            - Best practices mentioned in the blog posts
-            - Links to relevant AWS blog posts (format as: [Blog Post Title](https://aws.amazon.com/blogs/...))
-
-            Provide clear, actionable guidance without generating any infrastructure templates.
-
-            At the end of your response, suggest 2-3 specific follow-up questions that would help the user:
-            - Dive deeper into the topic
-            - Explore related AWS services
-            - Understand implementation details
-            - Consider alternative approaches
-
-            Format the follow-up questions clearly, like:
-
-            Follow-up questions you might consider:
-            - [Question 1]
-            - [Question 2]
-            - [Question 3]"""
+            prompt = _KNOWLEDGE_PROMPT_TEMPLATE.format(requirements=requirements)
 
         try:
             # Get MCP client wrapper from singleton manager
@@ -2502,28 +2854,27 @@ class MCPKnowledgeAgent:
             async with mcp_client_wrapper as mcp_client:
                 # Get tools from MCP server
                 tools = mcp_client.list_tools_sync()
-                logger.info(f"Retrieved {len(tools)} tools from MCP Server")
+                logger.info("Retrieved %d tools from MCP Server", len(tools))
 
                 # Log tool names for debugging
                 tool_names = []
                 tool_details = []
+                log_details = logger.isEnabledFor(logging.DEBUG)
                 for tool in tools:
-                    if hasattr(tool, 'tool_name'):
-                        tool_name = tool.tool_name
-                        tool_names.append(tool_name)
-                        # Get tool description if available
-                        if hasattr(tool, 'description'):
-                            tool_details.append(f"{tool_name}: {tool.description[:100]}")
-                    else:
-                        tool_name = tool.__class__.__name__
-                        tool_names.append(tool_name)
-                logger.info(f"Available tools: {tool_names}")
+                    tool_name = getattr(tool, 'tool_name', None) or tool.__class__.__name__
+                    tool_names.append(tool_name)
+                    # Get tool description if available (only logged at DEBUG)
+                    if log_details:
+                        description = getattr(tool, 'description', None)
+                        if description is not None:
+                            tool_details.append(f"{tool_name}: {description[:100]}")
+                logger.info("Available tools: %s", tool_names)
                 if tool_details:
-                    logger.debug(f"Tool details: {tool_details}")
+                    logger.debug("Tool details: %s", tool_details)
                 
                 # Check if generate_diagram tool is available
                 if 'generate_diagram' not in tool_names:
-                    logger.warning(f"generate_diagram tool not found! Available tools: {tool_names}")
+                    logger.warning("generate_diagram tool not found! Available tools: %s", tool_names)
                 else:
                     logger.info("generate_diagram tool is available")
 
@@ -2545,64 +2896,57 @@ class MCPKnowledgeAgent:
             # Extract content from the response message and track tool usage
             content = ""
             if hasattr(response, 'message') and isinstance(response.message, dict):
-                if 'content' in response.message and isinstance(response.message['content'], list):
+                message_content = response.message.get('content')
+                if isinstance(message_content, list):
                     # Extract text from content blocks
                     content_parts = []
-                    for block in response.message['content']:
+                    # Blocks of one response share a single tool usage timestamp
+                    response_timestamp = datetime.now().isoformat()
+                    for block in message_content:
                         if isinstance(block, dict):
+                            block_type = block.get('type')
+                            has_tool_id = 'tool_use_id' in block
+                            
                             # Track tool usage
-                            if block.get('type') == 'tool_use' or 'tool_use_id' in block:
-                                tool_name = block.get('name', 'unknown')
+                            usage_type = "tool_use" if has_tool_id else _TOOL_USAGE_TYPES.get(block_type)
+                            if usage_type:
                                 tool_usage_log.append({
-                                    "tool": tool_name,
-                                    "timestamp": datetime.now().isoformat(),
-                                    "type": "tool_use"
-                                })
-                            elif block.get('type') == 'tool_result':
-                                tool_name = block.get('name', 'unknown')
-                                tool_usage_log.append({
-                                    "tool": tool_name,
-                                    "timestamp": datetime.now().isoformat(),
-                                    "type": "tool_result"
+                                    "tool": block.get('name', 'unknown'),
+                                    "timestamp": response_timestamp,
+                                    "type": usage_type
                                 })
                             
                             # Check for tool use results (diagram tool responses)
-                            if 'tool_use_id' in block or block.get('type') == 'tool_result':
+                            if has_tool_id or block_type == 'tool_result':
                                 # Tool response - extract SVG if present
                                 block_text = block.get('text') or block.get('content') or ''
                                 if isinstance(block_text, str):
+                                    block_text_lower = block_text.lower()
                                     # Check for SVG in tool response
-                                    if '<svg' in block_text.lower():
-                                        import re
+                                    if '<svg' in block_text_lower:
                                         # More robust SVG extraction - handle whitespace and newlines
-                                        svg_match = re.search(r'<svg[^>]*>.*?</svg>', block_text, re.DOTALL | re.IGNORECASE)
+                                        svg_match = _SVG_RE.search(block_text)
                                         if svg_match:
                                             svg_content = svg_match.group(0)
                                             content_parts.append(svg_content)
-                                            logger.info(f"Extracted SVG from tool response ({len(svg_content)} chars)")
+                                            logger.info("Extracted SVG from tool response (%d chars)", len(svg_content))
                                         else:
-                                            # Try to find SVG even if malformed
-                                            svg_start = block_text.lower().find('<svg')
-                                            if svg_start >= 0:
-                                                # Extract from SVG start to end of string or next tag
-                                                potential_svg = block_text[svg_start:]
-                                                # Try to find closing tag
-                                                svg_end = potential_svg.rfind('</svg>')
-                                                if svg_end > 0:
-                                                    svg_content = potential_svg[:svg_end + 6]
-                                                    content_parts.append(svg_content)
-                                                    logger.info(f"Extracted SVG using fallback method ({len(svg_content)} chars)")
-                                                else:
-                                                    content_parts.append(block_text)
+                                            # Try to find SVG even if malformed: first opening to last closing tag
+                                            svg_start = block_text_lower.find('<svg')
+                                            svg_end = block_text_lower.rfind('</svg>')
+                                            if svg_start >= 0 and svg_end > svg_start:
+                                                svg_content = block_text[svg_start:svg_end + 6]
+                                                content_parts.append(svg_content)
+                                                logger.info("Extracted SVG using fallback method (%d chars)", len(svg_content))
                                             else:
                                                 content_parts.append(block_text)
                                     else:
                                         content_parts.append(block_text)
                             elif 'text' in block:
                                 content_parts.append(block['text'])
-                    content = '\n'.join(content_parts)
-                elif isinstance(response.message['content'], str):
-                    content = response.message['content']
+                    content = content_parts[0] if len(content_parts) == 1 else '\n'.join(content_parts)
+                elif isinstance(message_content, str):
+                    content = message_content
             elif hasattr(response, 'content'):
                 content = str(response.content)
             else:
@@ -2610,77 +2954,14 @@ class MCPKnowledgeAgent:
             
             # Log content preview for debugging
             if inputs.get("mode") == "diagram":
-                logger.info(f"Raw content from agent response: {len(content)} chars, preview: {content[:200] if content else 'Empty'}")
-                logger.info(f"Content contains '<svg': {'<svg' in content.lower()}")
+                logger.info("Raw content from agent response: %d chars, preview: %.200s", len(content), content or 'Empty')
+                logger.info("Content contains '<svg': %s", '<svg' in content.lower())
             
             # If mode is diagram, extract diagram image (PNG or SVG) and preserve explanation text
             diagram_image = ""
             architecture_explanation = ""
             if inputs.get("mode") == "diagram" and content:
-                import re
-                # First, try to clean up content - remove markdown code blocks if present
-                cleaned_content = content
-                # Remove markdown code blocks that might wrap image data
-                if '```' in cleaned_content:
-                    # Try to extract from markdown code blocks
-                    code_block_match = re.search(r'```(?:svg|xml|html|png|image)?\s*\n?(.*?)```', cleaned_content, re.DOTALL | re.IGNORECASE)
-                    if code_block_match:
-                        cleaned_content = code_block_match.group(1)
-                        logger.info("Extracted content from markdown code block")
-                
-                # Priority 1: Look for base64 image data (PNG from generate_diagram tool)
-                # The tool returns PNG images as base64 data URLs
-                base64_image_match = re.search(r'data:image/(png|jpeg|jpg|svg\+xml);base64,([A-Za-z0-9+/=]+)', cleaned_content, re.IGNORECASE)
-                if base64_image_match:
-                    image_type = base64_image_match.group(1).lower()
-                    base64_data = base64_image_match.group(2)
-                    diagram_image = f"data:image/{image_type};base64,{base64_data}"
-                    # Extract explanation text that comes after the image
-                    image_end_pos = base64_image_match.end()
-                    explanation_text = cleaned_content[image_end_pos:].strip()
-                    if explanation_text:
-                        explanation_text = re.sub(r'```.*?```', '', explanation_text, flags=re.DOTALL)
-                        explanation_text = re.sub(r'data:image.*?base64,.*', '', explanation_text, flags=re.DOTALL | re.IGNORECASE)
-                        explanation_text = explanation_text.strip()
-                        if explanation_text and len(explanation_text) > 10:
-                            architecture_explanation = explanation_text
-                    logger.info(f"Extracted base64 {image_type.upper()} image ({len(diagram_image)} chars) and explanation ({len(architecture_explanation)} chars)")
-                    content = diagram_image
-                # Priority 2: Look for SVG in the content
-                elif '<svg' in cleaned_content.lower():
-                    svg_match = re.search(r'<svg[^>]*>.*?</svg>', cleaned_content, re.DOTALL | re.IGNORECASE)
-                    if svg_match:
-                        diagram_image = svg_match.group(0).strip()
-                        # Extract explanation text that comes after the SVG
-                        svg_end_pos = svg_match.end()
-                        explanation_text = cleaned_content[svg_end_pos:].strip()
-                        if explanation_text:
-                            explanation_text = re.sub(r'</svg>.*', '', explanation_text, flags=re.DOTALL)
-                            explanation_text = re.sub(r'```.*?```', '', explanation_text, flags=re.DOTALL)
-                            explanation_text = explanation_text.strip()
-                            if explanation_text and len(explanation_text) > 10:
-                                architecture_explanation = explanation_text
-                        logger.info(f"Extracted SVG diagram ({len(diagram_image)} chars) and explanation ({len(architecture_explanation)} chars)")
-                        content = diagram_image
-                # Priority 3: Look for any base64 data (fallback)
-                elif "base64" in cleaned_content.lower():
-                    base64_match = re.search(r'data:image/[^;]+;base64,[^\s"\'<>]+', cleaned_content, re.IGNORECASE)
-                    if base64_match:
-                        diagram_image = base64_match.group(0)
-                        base64_end_pos = base64_match.end()
-                        explanation_text = cleaned_content[base64_end_pos:].strip()
-                        if explanation_text:
-                            explanation_text = re.sub(r'```.*?```', '', explanation_text, flags=re.DOTALL)
-                            explanation_text = explanation_text.strip()
-                            if explanation_text and len(explanation_text) > 10:
-                                architecture_explanation = explanation_text
-                        content = diagram_image
-                        logger.info(f"Extracted base64 image (fallback) ({len(diagram_image)} chars) and explanation ({len(architecture_explanation)} chars)")
-                else:
-                    # No image found - log for debugging
-                    logger.warning(f"No image (PNG/SVG) found in diagram mode content. Content length: {len(content)}, preview: {content[:300]}")
-                    # Keep original content in case it's valid but not matching our patterns
-                    content = cleaned_content
+                diagram_image, architecture_explanation, content = _extract_diagram_payload(content)
 
             # Extract follow-up questions if not in diagram mode
             follow_up_questions = []
@@ -2699,54 +2980,12 @@ class MCPKnowledgeAgent:
             }
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"Core MCP Knowledge agent execution failed: {e}")
+            logger.error("Core MCP Knowledge agent execution failed: %s", e)
             
-            # Provide helpful error message for inference profile issues
-            if "ValidationException" in error_msg and "inference profile" in error_msg.lower():
-                logger.error("=" * 80)
-                logger.error("AWS BEDROCK INFERENCE PROFILE ERROR")
-                logger.error("=" * 80)
-                logger.error("The model ID requires an inference profile for Converse API.")
-                logger.error("")
-                logger.error("To fix this:")
-                logger.error("  1. Add to backend/.env:")
-                logger.error("     BEDROCK_MODEL_ID=anthropic.claude-3-5-sonnet-20240620-v1:0")
-                logger.error("")
-                logger.error("  2. Or create an inference profile in AWS Bedrock console")
-                logger.error("     and use the inference profile ARN as BEDROCK_MODEL_ID")
-                logger.error("=" * 80)
-                
-                user_friendly_error = (
-                    "I encountered an AWS Bedrock model configuration error. "
-                    "The model requires an inference profile. Please set BEDROCK_MODEL_ID in backend/.env "
-                    "to 'anthropic.claude-3-5-sonnet-20240620-v1:0' or use an inference profile ARN. "
-                    "See server logs for detailed instructions."
-                )
-            # Provide helpful error message for credential issues
-            elif "UnrecognizedClientException" in error_msg or "security token" in error_msg.lower():
-                logger.error("=" * 80)
-                logger.error("AWS CREDENTIAL ERROR DETECTED DURING EXECUTION")
-                logger.error("=" * 80)
-                logger.error("Your AWS credentials are invalid, expired, or don't have Bedrock access.")
-                logger.error("")
-                logger.error("To fix this:")
-                logger.error("  1. Check your backend/.env file has valid credentials:")
-                logger.error("     AWS_ACCESS_KEY_ID=your_valid_access_key")
-                logger.error("     AWS_SECRET_ACCESS_KEY=your_valid_secret_key")
-                logger.error("     AWS_REGION=us-east-1")
-                logger.error("")
-                logger.error("  2. Verify credentials have Bedrock permissions in AWS IAM")
-                logger.error("  3. Restart the backend server after updating .env")
-                logger.error("=" * 80)
-                
-                user_friendly_error = (
-                    "I encountered an AWS credential error while accessing AWS knowledge. "
-                    "Your AWS credentials appear to be invalid, expired, or missing Bedrock permissions. "
-                    "Please update your backend/.env file with valid AWS credentials that have Bedrock access, "
-                    "then restart the backend server. See the server logs for detailed instructions."
-                )
-            else:
-                user_friendly_error = f"I encountered an error while accessing AWS knowledge: {error_msg}"
+            # Provide helpful error message for inference profile and credential issues
+            log_lines, user_friendly_error = _classify_bedrock_error(error_msg)
+            for line in log_lines:
+                logger.error(line)
             
             return {
                 "content": user_friendly_error,
@@ -2769,40 +3008,7 @@ class MCPKnowledgeAgent:
         if custom_prompt:
             prompt = custom_prompt
         else:
-            prompt = f"""Please provide comprehensive information about: {requirements}
-
-
-
-
-            Focus on:
-            - Relevant AWS services and their capabilities
-            - Best practices and recommendations from AWS documentation
-            - Use cases and examples
-            - Architectural patterns and trade-offs
-            - Security considerations
-            - Cost optimization strategies
-
-            If the user asks about blog posts, provide detailed information as if you have direct access to AWS blog articles, including:
-            - Recent blog post titles and topics related to the query
-            - Key insights and recommendations from the posts
-            - Relevant AWS service updates and announcements
-            - Best practices mentioned in the blog posts
-            - Links to relevant AWS blog posts (format as: [Blog Post Title](https://aws.amazon.com/blogs/...))
-
-            Provide clear, actionable guidance without generating any infrastructure templates.
-
-            At the end of your response, suggest 2-3 specific follow-up questions that would help the user:
-            - Dive deeper into the topic
-            - Explore related AWS services
-            - Understand implementation details
-            - Consider alternative approaches
-
-            Format the follow-up questions clearly, like:
-
-            Follow-up questions you might consider:
-            - [Question 1]
-            - [Question 2]
-            - [Question 3]"""
+            prompt = _KNOWLEDGE_PROMPT_TEMPLATE.format(requirements=requirements)
 
         try:
             # Get MCP client wrapper from singleton manager
@@ -2812,16 +3018,13 @@ class MCPKnowledgeAgent:
             async with mcp_client_wrapper as mcp_client:
                 # Get tools from MCP server
                 tools = mcp_client.list_tools_sync()
-                logger.info(f"Retrieved {len(tools)} tools from MCP Server for streaming")
+                logger.info("Retrieved %d tools from MCP Server for streaming", len(tools))
 
                 # Log tool names for debugging
                 tool_names = []
                 for tool in tools:
-                    if hasattr(tool, 'tool_name'):
-                        tool_names.append(tool.tool_name)
-                    else:
-                        tool_names.append(tool.__class__.__name__)
-                logger.info(f"Available tools for streaming: {tool_names}")
+                    tool_names.append(getattr(tool, 'tool_name', None) or tool.__class__.__name__)
+                logger.info("Available tools for streaming: %s", tool_names)
 
                 # Create the agent with MCP tools within the context manager
                 agent = Agent(
@@ -2833,58 +3036,30 @@ class MCPKnowledgeAgent:
                 )
 
                 # Stream the agent response
-                # Collect all content to check for diagram output
-                full_streaming_content = []
+                # Check each data chunk for diagram output until the first hit
+                diagram_content_detected = False
                 async for event in agent.stream_async(prompt):
-                    # Collect data events for later processing
-                    if "data" in event:
-                        full_streaming_content.append(event["data"])
+                    if not diagram_content_detected and "data" in event:
+                        chunk = event["data"]
+                        if 'Diagram' in chunk or 'diagrams' in chunk.lower() or '.png' in chunk or '.svg' in chunk:
+                            diagram_content_detected = True
                     yield event
                 
                 # Log if we got any diagram-related content
-                if full_streaming_content:
-                    full_text = ''.join(full_streaming_content)
-                    if 'Diagram' in full_text or 'diagrams' in full_text.lower() or '.png' in full_text or '.svg' in full_text:
-                        logger.info("Diagram content detected in streaming response")
+                if diagram_content_detected:
+                    logger.info("Diagram content detected in streaming response")
 
             # Release the MCP client usage
             await mcp_client_manager.release_mcp_client()
 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"Core MCP Knowledge agent streaming failed: {e}")
+            logger.error("Core MCP Knowledge agent streaming failed: %s", e)
             
-            # Provide helpful error message for inference profile issues
-            if "ValidationException" in error_msg and "inference profile" in error_msg.lower():
-                logger.error("=" * 80)
-                logger.error("AWS BEDROCK INFERENCE PROFILE ERROR")
-                logger.error("=" * 80)
-                logger.error("The model ID requires an inference profile for ConverseStream API.")
-                logger.error("Please set BEDROCK_MODEL_ID=anthropic.claude-3-5-sonnet-20240620-v1:0 in backend/.env")
-                logger.error("=" * 80)
-                
-                user_friendly_error = (
-                    "I encountered an AWS Bedrock model configuration error. "
-                    "Please set BEDROCK_MODEL_ID in backend/.env to 'anthropic.claude-3-5-sonnet-20240620-v1:0' "
-                    "or use an inference profile ARN."
-                )
-            # Provide helpful error message for credential issues
-            elif "UnrecognizedClientException" in error_msg or "security token" in error_msg.lower():
-                logger.error("=" * 80)
-                logger.error("AWS CREDENTIAL ERROR DETECTED DURING STREAMING")
-                logger.error("=" * 80)
-                logger.error("Your AWS credentials are invalid, expired, or don't have Bedrock access.")
-                logger.error("Please update your backend/.env file with valid AWS credentials.")
-                logger.error("=" * 80)
-                
-                user_friendly_error = (
-                    "I encountered an AWS credential error while accessing AWS knowledge. "
-                    "Your AWS credentials appear to be invalid, expired, or missing Bedrock permissions. "
-                    "Please update your backend/.env file with valid AWS credentials that have Bedrock access, "
-                    "then restart the backend server."
-                )
-            else:
-                user_friendly_error = f"I encountered an error while accessing AWS knowledge: {error_msg}"
+            # Provide helpful error message for inference profile and credential issues
+            log_lines, user_friendly_error = _classify_bedrock_error(error_msg, streaming=True)
+            for line in log_lines:
+                logger.error(line)
             
             # Yield error event
             yield {
@@ -5,8 +5,11 @@ Tests the diagram server directly to verify functionality and understand respons
 
 import asyncio
 import logging
+import os
+import re
 import sys
 import json
+import traceback
 from pathlib import Path
 
 # Add parent directory to path
@@ -21,215 +24,312 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Full tracebacks are only printed when TEST_DEBUG=1
+DEBUG_TRACEBACKS = os.getenv('TEST_DEBUG') == '1'
+
+# Case-insensitive search without building a lowercased copy of large payloads
+_SVG_HEAD = re.compile(r'<svg', re.IGNORECASE)
+
+SIMPLE_DIAGRAM_CODE = """from diagrams import Diagram
+from diagrams.aws.compute import Lambda
+from diagrams.aws.database import Dynamodb
+from diagrams.aws.network import APIGateway
+
+with Diagram("Test Serverless Application", show=False):
+    api = APIGateway("API Gateway")
+    function = Lambda("Function")
+    database = Dynamodb("DynamoDB")
+    api >> function >> database"""
+
+# Same diagram for servers that pre-import the diagrams library
+SIMPLE_DIAGRAM_CODE_NO_IMPORTS = """with Diagram("Test Serverless Application", show=False):
+    api = APIGateway("API Gateway")
+    function = Lambda("Function")
+    database = Dynamodb("DynamoDB")
+    api >> function >> database"""
+
+
+BATCH_OPS = ("get_diagram_examples", "generate_diagram", "list_icons")
+
+
+def _parse_batch_results(batch_result) -> list:
+    """Per-op results from the JSON text items of a batch_execute ToolResult"""
+    for item in batch_result.get("content", []):
+        if not isinstance(item, dict) or 'text' not in item:
+            continue
+        try:
+            payload = json.loads(item['text'])
+        except ValueError:
+            continue
+        if isinstance(payload, dict):
+            payload = payload.get("results")
+        if isinstance(payload, list):
+            return payload
+    return []
+
+
+def _batch_op_outcome(name: str, op_result) -> tuple:
+    """(name, ok, result_or_exception) for one batch op, as the single-call runners return"""
+    if op_result is None:
+        return name, False, RuntimeError("batch_execute returned no result for this op")
+    if isinstance(op_result, dict):
+        error = op_result.get("error")
+        if error or op_result.get("isError") or op_result.get("status") == "error":
+            return name, False, RuntimeError(str(error or op_result))
+    return name, True, op_result
+
+
+async def run_batched_checks(call_tool) -> tuple:
+    """
+    Run the three diagram checks through a batch_execute aggregator in a single round-trip.
+    Returns (examples, generate, icons) outcomes shaped like the single-call runners'.
+    """
+    try:
+        batch_result = await call_tool("batch_execute", {
+            "ops": [
+                {"tool": "get_diagram_examples", "arguments": {}},
+                {"tool": "generate_diagram", "arguments": {"code": SIMPLE_DIAGRAM_CODE}},
+                {"tool": "list_icons", "arguments": {}}
+            ],
+            "maxConcurrent": 3,
+            "stopOnError": False
+        })
+    except Exception as e:
+        # An aggregator failure (error ToolResult) fails every op
+        return (BATCH_OPS[0], False, e), (BATCH_OPS[1], False, e, None), (BATCH_OPS[2], False, e)
+
+    results = _parse_batch_results(batch_result)
+    # A missing or short result list fails the ops that have no result
+    examples, generate, icons = (
+        _batch_op_outcome(name, results[i] if i < len(results) else None)
+        for i, name in enumerate(BATCH_OPS)
+    )
+    return examples, generate + (None,), icons
+
+
+async def run_examples(call_tool) -> tuple:
+    """Call get_diagram_examples, returning (name, ok, result_or_exception)"""
+    try:
+        return "get_diagram_examples", True, await call_tool("get_diagram_examples", {})
+    except Exception as e:
+        return "get_diagram_examples", False, e
+
+
+async def run_generate(call_tool) -> tuple:
+    """
+    Call generate_diagram with imports, retrying without imports only on import errors.
+    Returns (name, ok, result_or_exception) plus the first attempt's exception, if retried.
+    """
+    try:
+        return "generate_diagram (with imports)", True, await call_tool(
+            "generate_diagram", {"code": SIMPLE_DIAGRAM_CODE}
+        ), None
+    except Exception as e:
+        message = str(e).lower()
+        if 'import' not in message and 'not defined' not in message:
+            # Not an import problem, so a second round-trip would fail the same way
+            return "generate_diagram (with imports)", False, e, None
+        first_error = e
+
+    # Try without imports (in case library is pre-imported)
+    try:
+        return "generate_diagram (without imports)", True, await call_tool(
+            "generate_diagram", {"code": SIMPLE_DIAGRAM_CODE_NO_IMPORTS}
+        ), first_error
+    except Exception as e:
+        return "generate_diagram (without imports)", False, e, first_error
+
+
+async def run_icons(call_tool) -> tuple:
+    """Call list_icons, returning (name, ok, result_or_exception)"""
+    try:
+        return "list_icons", True, await call_tool("list_icons", {})
+    except Exception as e:
+        return "list_icons", False, e
+
+
+def _preview(obj, limit: int = 2000) -> str:
+    """Compact JSON preview truncated to limit characters"""
+    try:
+        text = json.dumps(obj, separators=(',', ':'), default=str)
+    except (TypeError, ValueError):
+        text = repr(obj)
+    return text[:limit] + ('...' if len(text) > limit else '')
+
+
+def print_failure(name: str, error: Exception) -> None:
+    """Print a failed tool call with its traceback"""
+    print(f"   ✗ {name} failed: {error}")
+    if DEBUG_TRACEBACKS:
+        traceback.print_exception(type(error), error, error.__traceback__)
+
+
+def print_svg_check(text: str, preview_chars: int) -> None:
+    """Report whether text contains an SVG and show a preview"""
+    if _SVG_HEAD.search(text):
+        print(f"   ✓ Contains SVG!")
+        print(f"   SVG preview: {text[:300]}...")
+    else:
+        print(f"   Preview: {text[:preview_chars]}...")
+
+
+def report_examples(outcome: tuple) -> None:
+    """Print the get_diagram_examples result"""
+    print("\n3. Testing get_diagram_examples...")
+    name, ok, examples_result = outcome
+    if not ok:
+        print_failure(name, examples_result)
+        return
+
+    print(f"   ✓ get_diagram_examples succeeded")
+    print(f"   Result type: {type(examples_result)}")
+
+    # Try to extract the examples
+    if isinstance(examples_result, dict):
+        print(f"   Result keys: {list(examples_result.keys())}")
+        if 'content' in examples_result:
+            content = examples_result['content']
+            if isinstance(content, list):
+                print(f"   Content is a list with {len(content)} items")
+                for i, item in enumerate(content[:3]):  # Show first 3
+                    print(f"   Item {i}: {str(item)[:200]}...")
+            else:
+                print(f"   Content preview: {str(content)[:500]}...")
+        else:
+            print(f"   Full result: {_preview(examples_result, 1000)}")
+    else:
+        print(f"   Result preview: {str(examples_result)[:500]}...")
+
+
+def report_generate(outcome: tuple) -> None:
+    """Print the generate_diagram result, including the retry without imports"""
+    print("\n4. Testing generate_diagram with simple example...")
+    name, ok, generate_result, first_error = outcome
+    if first_error is not None:
+        print_failure("generate_diagram (with imports)", first_error)
+        print("\n   Attempting without imports...")
+    if not ok:
+        print_failure(name, generate_result)
+        return
+
+    print(f"   ✓ {name} succeeded")
+    print(f"   Result type: {type(generate_result)}")
+
+    if first_error is not None:
+        # Retry path only reports the basics
+        if isinstance(generate_result, dict):
+            print(f"   Result keys: {list(generate_result.keys())}")
+        else:
+            result_str = str(generate_result)
+            if _SVG_HEAD.search(result_str):
+                print(f"   ✓ Contains SVG!")
+                print(f"   SVG preview: {result_str[:300]}...")
+        return
+
+    if isinstance(generate_result, dict):
+        print(f"   Result keys: {list(generate_result.keys())}")
+        if 'content' in generate_result:
+            content = generate_result['content']
+            if isinstance(content, list):
+                for i, item in enumerate(content):
+                    if isinstance(item, dict) and 'text' in item:
+                        text = item['text']
+                        print(f"   Content item {i} (text): {len(text)} chars")
+                        print_svg_check(text, 200)
+                    else:
+                        print(f"   Content item {i}: {str(item)[:200]}...")
+            else:
+                content_str = str(content)
+                print(f"   Content length: {len(content_str)} chars")
+                print_svg_check(content_str, 500)
+        else:
+            print(f"   Full result: {_preview(generate_result)}")
+    else:
+        result_str = str(generate_result)
+        print(f"   Result length: {len(result_str)} chars")
+        print_svg_check(result_str, 500)
+
+
+def report_icons(outcome: tuple) -> None:
+    """Print the list_icons result"""
+    print("\n5. Testing list_icons...")
+    name, ok, icons_result = outcome
+    if not ok:
+        print_failure(name, icons_result)
+        return
+
+    print(f"   ✓ list_icons succeeded")
+    print(f"   Result type: {type(icons_result)}")
+    if isinstance(icons_result, dict):
+        print(f"   Result keys: {list(icons_result.keys())}")
+    else:
+        print(f"   Preview: {str(icons_result)[:500]}...")
+
 
 async def test_diagram_mcp_server():
     """Test the AWS Diagram MCP Server directly"""
-    
+
     print("=" * 80)
     print("Testing AWS Diagram MCP Server")
     print("=" * 80)
-    
+
     # Use the same MCP client manager as the application
     diagram_servers = ["aws-diagram-server"]
-    
+
     try:
         # Get MCP client wrapper from singleton manager
         print("\n1. Connecting to MCP server...")
         mcp_client_wrapper = await mcp_client_manager.get_mcp_client_wrapper(diagram_servers)
-        
+
         # Execute with MCP tools - use the wrapper for proper context management
         async with mcp_client_wrapper as mcp_client:
             # List available tools
             print("\n2. Listing available tools...")
-            tools = mcp_client.list_tools_sync()
-            print(f"   Found {len(tools)} tools:")
-            for tool in tools:
-                tool_name = getattr(tool, 'tool_name', tool.__class__.__name__)
+            tools = await mcp_client_manager.list_tools(mcp_client)
+            # Resolve each tool's name once for printing, filtering and the batch check
+            named_tools = [(getattr(tool, 'tool_name', tool.__class__.__name__), tool) for tool in tools]
+            print(f"   Found {len(named_tools)} tools:")
+            for tool_name, _ in named_tools:
                 print(f"   - {tool_name}")
-            
+
             # Find the diagram tools
-            diagram_tools = {}
-            for tool in tools:
-                tool_name = getattr(tool, 'tool_name', tool.__class__.__name__)
-                if 'diagram' in tool_name.lower():
-                    diagram_tools[tool_name] = tool
-            
+            diagram_tools = {tool_name: tool for tool_name, tool in named_tools if 'diagram' in tool_name.lower()}
+
             if not diagram_tools:
                 print("   ⚠ No diagram tools found!")
                 return False
-            
-            # Test 1: Get diagram examples
-            print("\n3. Testing get_diagram_examples...")
-            try:
-                # Use the underlying MCP session directly
-                # The mcp_client should have a _session or similar attribute
-                if hasattr(mcp_client, '_background_thread_session'):
-                    session = mcp_client._background_thread_session
-                    examples_result = await session.call_tool("get_diagram_examples", {})
-                elif hasattr(mcp_client, 'call_tool'):
-                    examples_result = await mcp_client.call_tool("get_diagram_examples", {})
-                else:
-                    # Try call_tool_async with correct signature
-                    examples_result = await mcp_client.call_tool_async("get_diagram_examples", {})
-                print(f"   ✓ get_diagram_examples succeeded")
-                print(f"   Result type: {type(examples_result)}")
-                
-                # Try to extract the examples
-                if isinstance(examples_result, dict):
-                    print(f"   Result keys: {list(examples_result.keys())}")
-                    if 'content' in examples_result:
-                        content = examples_result['content']
-                        if isinstance(content, list):
-                            print(f"   Content is a list with {len(content)} items")
-                            for i, item in enumerate(content[:3]):  # Show first 3
-                                print(f"   Item {i}: {str(item)[:200]}...")
-                        else:
-                            print(f"   Content preview: {str(content)[:500]}...")
-                    else:
-                        print(f"   Full result: {json.dumps(examples_result, indent=2)[:1000]}...")
-                else:
-                    print(f"   Result preview: {str(examples_result)[:500]}...")
-                    
-            except Exception as e:
-                print(f"   ✗ get_diagram_examples failed: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # Test 2: Generate a simple diagram
-            print("\n4. Testing generate_diagram with simple example...")
-            
-            # First, let's try with imports (as shown in documentation)
-            simple_diagram_code = """from diagrams import Diagram
-from diagrams.aws.compute import Lambda
-from diagrams.aws.database import Dynamodb
-from diagrams.aws.network import APIGateway
 
-with Diagram("Test Serverless Application", show=False):
-    api = APIGateway("API Gateway")
-    function = Lambda("Function")
-    database = Dynamodb("DynamoDB")
-    api >> function >> database"""
-            
-            try:
-                print("   Attempting with imports...")
-                if hasattr(mcp_client, '_background_thread_session'):
-                    session = mcp_client._background_thread_session
-                    generate_result = await session.call_tool("generate_diagram", {"code": simple_diagram_code})
-                elif hasattr(mcp_client, 'call_tool'):
-                    generate_result = await mcp_client.call_tool("generate_diagram", {"code": simple_diagram_code})
-                else:
-                    generate_result = await mcp_client.call_tool_async("generate_diagram", {"code": simple_diagram_code})
-                print(f"   ✓ generate_diagram succeeded (with imports)")
-                print(f"   Result type: {type(generate_result)}")
-                
-                if isinstance(generate_result, dict):
-                    print(f"   Result keys: {list(generate_result.keys())}")
-                    if 'content' in generate_result:
-                        content = generate_result['content']
-                        if isinstance(content, list):
-                            for i, item in enumerate(content):
-                                if isinstance(item, dict) and 'text' in item:
-                                    text = item['text']
-                                    print(f"   Content item {i} (text): {len(text)} chars")
-                                    if '<svg' in text.lower():
-                                        print(f"   ✓ Contains SVG!")
-                                        print(f"   SVG preview: {text[:300]}...")
-                                    else:
-                                        print(f"   Preview: {text[:200]}...")
-                                else:
-                                    print(f"   Content item {i}: {str(item)[:200]}...")
-                        else:
-                            content_str = str(content)
-                            print(f"   Content length: {len(content_str)} chars")
-                            if '<svg' in content_str.lower():
-                                print(f"   ✓ Contains SVG!")
-                                print(f"   SVG preview: {content_str[:300]}...")
-                            else:
-                                print(f"   Preview: {content_str[:500]}...")
-                    else:
-                        print(f"   Full result: {json.dumps(generate_result, indent=2)[:2000]}...")
-                else:
-                    result_str = str(generate_result)
-                    print(f"   Result length: {len(result_str)} chars")
-                    if '<svg' in result_str.lower():
-                        print(f"   ✓ Contains SVG!")
-                        print(f"   SVG preview: {result_str[:300]}...")
-                    else:
-                        print(f"   Preview: {result_str[:500]}...")
-                        
-            except Exception as e:
-                print(f"   ✗ generate_diagram failed (with imports): {e}")
-                import traceback
-                traceback.print_exc()
-                
-                # Try without imports (in case library is pre-imported)
-                print("\n   Attempting without imports...")
-                simple_diagram_code_no_imports = """with Diagram("Test Serverless Application", show=False):
-    api = APIGateway("API Gateway")
-    function = Lambda("Function")
-    database = Dynamodb("DynamoDB")
-    api >> function >> database"""
-                
-                try:
-                    if hasattr(mcp_client, '_background_thread_session'):
-                        session = mcp_client._background_thread_session
-                        generate_result = await session.call_tool("generate_diagram", {"code": simple_diagram_code_no_imports})
-                    elif hasattr(mcp_client, 'call_tool'):
-                        generate_result = await mcp_client.call_tool("generate_diagram", {"code": simple_diagram_code_no_imports})
-                    else:
-                        generate_result = await mcp_client.call_tool_async("generate_diagram", {"code": simple_diagram_code_no_imports})
-                    print(f"   ✓ generate_diagram succeeded (without imports)")
-                    print(f"   Result type: {type(generate_result)}")
-                    if isinstance(generate_result, dict):
-                        print(f"   Result keys: {list(generate_result.keys())}")
-                    else:
-                        result_str = str(generate_result)
-                        if '<svg' in result_str.lower():
-                            print(f"   ✓ Contains SVG!")
-                            print(f"   SVG preview: {result_str[:300]}...")
-                except Exception as e2:
-                    print(f"   ✗ generate_diagram failed (without imports): {e2}")
-                    import traceback
-                    traceback.print_exc()
+            call_tool = mcp_client_manager.get_tool_caller(mcp_client)
             
-            # Test 3: List icons
-            print("\n5. Testing list_icons...")
-            try:
-                if hasattr(mcp_client, '_background_thread_session'):
-                    session = mcp_client._background_thread_session
-                    icons_result = await session.call_tool("list_icons", {})
-                elif hasattr(mcp_client, 'call_tool'):
-                    icons_result = await mcp_client.call_tool("list_icons", {})
-                else:
-                    icons_result = await mcp_client.call_tool_async("list_icons", {})
-                print(f"   ✓ list_icons succeeded")
-                print(f"   Result type: {type(icons_result)}")
-                if isinstance(icons_result, dict):
-                    print(f"   Result keys: {list(icons_result.keys())}")
-                else:
-                    print(f"   Preview: {str(icons_result)[:500]}...")
-            except Exception as e:
-                print(f"   ✗ list_icons failed: {e}")
-                import traceback
-                traceback.print_exc()
-        
-            # Release the MCP client usage
-            await mcp_client_manager.release_mcp_client()
-        
+            # Servers exposing a batch_execute aggregator take all three checks in one round-trip
+            if any(tool_name == 'batch_execute' for tool_name, _ in named_tools):
+                print("\n   Running diagram checks via batch_execute...")
+                examples, generate, icons = await run_batched_checks(call_tool)
+            else:
+                # The three calls are independent, so keep them in flight together
+                # and report in order once all have finished
+                examples, generate, icons = await asyncio.gather(
+                    run_examples(call_tool),
+                    run_generate(call_tool),
+                    run_icons(call_tool)
+                )
+            report_examples(examples)
+            report_generate(generate)
+            report_icons(icons)
+
         print("\n" + "=" * 80)
         print("Test completed!")
         print("=" * 80)
-        
+
     except Exception as e:
         print(f"\n✗ Failed to connect to MCP server: {e}")
-        import traceback
-        traceback.print_exc()
+        if DEBUG_TRACEBACKS:
+            traceback.print_exc()
         return False
-    
+
     return True
 
 
 if __name__ == "__main__":
     success = asyncio.run(test_diagram_mcp_server())
     sys.exit(0 if success else 1)
-
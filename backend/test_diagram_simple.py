@@ -5,7 +5,9 @@ This matches how the application actually uses the tools
 
 import asyncio
 import logging
+import re
 import sys
+import traceback
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
@@ -18,6 +20,26 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Full tracebacks are only printed when TEST_DEBUG=1
+DEBUG_TRACEBACKS = os.getenv('TEST_DEBUG') == '1'
+
+_SVG_RE = re.compile(r'<svg[^>]*>.*?</svg>', re.DOTALL | re.IGNORECASE)
+# Case-insensitive search without building a lowercased copy of large payloads
+_SVG_HEAD = re.compile(r'<svg', re.IGNORECASE)
+
+
+def _iter_text_items(response):
+    """Yield (index, item) for each dict content item of an agent response message"""
+    message = getattr(response, 'message', None)
+    if not isinstance(message, dict):
+        return
+    content = message.get('content')
+    if not isinstance(content, list):
+        return
+    for i, item in enumerate(content):
+        if isinstance(item, dict):
+            yield i, item
+
 
 async def test_diagram_with_agent():
     """Test diagram generation using Strands Agent (like the app does)"""
@@ -36,7 +58,7 @@ async def test_diagram_with_agent():
         async with mcp_client_wrapper as mcp_client:
             # Get tools
             print("\n2. Getting tools...")
-            tools = mcp_client.list_tools_sync()
+            tools = await mcp_client_manager.list_tools(mcp_client)
             print(f"   Found {len(tools)} tools:")
             for tool in tools:
                 tool_name = getattr(tool, 'tool_name', tool.__class__.__name__)
@@ -67,19 +89,17 @@ async def test_diagram_with_agent():
             try:
                 response1 = await agent.invoke_async(prompt1)
                 print(f"   ✓ Agent responded")
-                if hasattr(response1, 'message') and isinstance(response1.message, dict):
-                    content = response1.message.get('content', [])
-                    print(f"   Response content type: {type(content)}")
-                    if isinstance(content, list):
-                        for i, item in enumerate(content[:2]):
-                            if isinstance(item, dict) and 'text' in item:
-                                text = item['text']
-                                print(f"   Content {i}: {len(text)} chars")
-                                print(f"   Preview: {text[:300]}...")
+                for i, item in _iter_text_items(response1):
+                    if i >= 2:
+                        break
+                    text = item.get('text')
+                    if text is not None:
+                        print(f"   Content {i}: {len(text)} chars")
+                        print(f"   Preview: {text[:300]}...")
             except Exception as e:
                 print(f"   ✗ Failed: {e}")
-                import traceback
-                traceback.print_exc()
+                if DEBUG_TRACEBACKS:
+                    traceback.print_exc()
             
             # Test 2: Generate diagram
             print("\n5. Testing generate_diagram via agent...")
@@ -102,37 +122,34 @@ Return the SVG diagram directly."""
             try:
                 response2 = await agent.invoke_async(prompt2)
                 print(f"   ✓ Agent responded")
-                if hasattr(response2, 'message') and isinstance(response2.message, dict):
-                    content = response2.message.get('content', [])
-                    if isinstance(content, list):
-                        for i, item in enumerate(content):
-                            if isinstance(item, dict):
-                                if 'text' in item:
-                                    text = item['text']
-                                    print(f"   Content {i} (text): {len(text)} chars")
-                                    if '<svg' in text.lower():
-                                        print(f"   ✓ Contains SVG!")
-                                        # Save SVG to file for inspection
-                                        with open('test_diagram_output.svg', 'w', encoding='utf-8') as f:
-                                            # Extract SVG if wrapped
-                                            import re
-                                            svg_match = re.search(r'<svg[^>]*>.*?</svg>', text, re.DOTALL | re.IGNORECASE)
-                                            if svg_match:
-                                                f.write(svg_match.group(0))
-                                                print(f"   ✓ Saved SVG to test_diagram_output.svg")
-                                            else:
-                                                f.write(text)
-                                                print(f"   ⚠ Saved raw content to test_diagram_output.svg")
-                                    else:
-                                        print(f"   Preview: {text[:200]}...")
-                                elif 'tool_use_id' in item:
-                                    print(f"   Content {i}: Tool use result")
+                for i, item in _iter_text_items(response2):
+                    text = item.get('text')
+                    if text is not None:
+                        print(f"   Content {i} (text): {len(text)} chars")
+                        if _SVG_HEAD.search(text):
+                            print(f"   ✓ Contains SVG!")
+                            # Save SVG to file for inspection
+                            # Extract SVG if wrapped
+                            svg_match = _SVG_RE.search(text)
+                            payload = (svg_match.group(0) if svg_match else text).encode('utf-8')
+                            # Unbuffered so the encoded SVG goes out in a single write
+                            with open('test_diagram_output.svg', 'wb', buffering=0) as f:
+                                f.write(payload)
+                            if svg_match:
+                                print(f"   ✓ Saved SVG to test_diagram_output.svg")
+                                # The complete SVG is saved; later items need no scanning
+                                break
+                            else:
+                                print(f"   ⚠ Saved raw content to test_diagram_output.svg")
+                        else:
+                            print(f"   Preview: {text[:200]}...")
+                        continue
+                    if 'tool_use_id' in item:
+                        print(f"   Content {i}: Tool use result")
             except Exception as e:
                 print(f"   ✗ Failed: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        await mcp_client_manager.release_mcp_client()
+                if DEBUG_TRACEBACKS:
+                    traceback.print_exc()
         
         print("\n" + "=" * 80)
         print("Test completed! Check test_diagram_output.svg if generated.")
@@ -141,8 +158,8 @@ Return the SVG diagram directly."""
         
     except Exception as e:
         print(f"\n✗ Failed: {e}")
-        import traceback
-        traceback.print_exc()
+        if DEBUG_TRACEBACKS:
+            traceback.print_exc()
         return False
 
 
@@ -3,8 +3,11 @@ Test with simplest possible diagram to verify generate_diagram works
 """
 
 import asyncio
+import binascii
 import logging
+import re
 import sys
+import traceback
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
@@ -17,6 +20,45 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Full tracebacks are only printed when TEST_DEBUG=1
+DEBUG_TRACEBACKS = os.getenv('TEST_DEBUG') == '1'
+
+# Multiple of 4 so each chunk decodes independently
+BASE64_CHUNK_SIZE = 64 * 1024
+_SVG_RE = re.compile(r'<svg[^>]*>.*?</svg>', re.DOTALL | re.IGNORECASE)
+# Case-insensitive searches without building lowercased copies of large payloads
+_SVG_HEAD = re.compile(r'<svg', re.IGNORECASE)
+_DATA_IMAGE_HEAD = re.compile(r'data:image', re.IGNORECASE)
+_DATA_IMAGE_PNG = re.compile(r'data:image/png', re.IGNORECASE)
+_DATA_IMAGE_SVG = re.compile(r'data:image/svg', re.IGNORECASE)
+_DATA_IMAGE_PREFIX_LEN = len('data:image/')
+# The payload ends at the first character outside the base64 alphabet, so
+# fixed-size chunks of it stay 4-aligned
+_BASE64_RUN_RE = re.compile(r'[A-Za-z0-9+/=]*')
+
+
+def _iter_text_items(response):
+    """Yield (index, item) for each dict content item of an agent response message"""
+    message = getattr(response, 'message', None)
+    if not isinstance(message, dict):
+        return
+    content = message.get('content')
+    if not isinstance(content, list):
+        return
+    for i, item in enumerate(content):
+        if isinstance(item, dict):
+            yield i, item
+
+
+def _extract_data_url(text: str, start: int):
+    """Split the data URL starting at start into (image type, base64 payload)"""
+    marker = text.find(';base64,', start)
+    if marker < 0:
+        return None
+    img_type = text[start + _DATA_IMAGE_PREFIX_LEN:marker].lower()
+    payload = _BASE64_RUN_RE.match(text, marker + len(';base64,'))
+    return img_type, payload.group(0)
+
 
 async def test_simple_diagram():
     """Test with the simplest possible diagram"""
@@ -31,7 +73,7 @@ async def test_simple_diagram():
         mcp_client_wrapper = await mcp_client_manager.get_mcp_client_wrapper(diagram_servers)
         
         async with mcp_client_wrapper as mcp_client:
-            tools = mcp_client.list_tools_sync()
+            tools = await mcp_client_manager.list_tools(mcp_client)
             print(f"\nFound {len(tools)} tools")
             
             # Create agent
@@ -63,51 +105,54 @@ async def test_simple_diagram():
                 response = await agent.invoke_async(prompt)
                 print(f"\n✓ Agent responded")
                 
-                if hasattr(response, 'message') and isinstance(response.message, dict):
-                    content = response.message.get('content', [])
-                    if isinstance(content, list):
-                        for i, item in enumerate(content):
-                            if isinstance(item, dict):
-                                if 'text' in item:
-                                    text = item['text']
-                                    print(f"\nContent {i} (text): {len(text)} chars")
-                                    
-                                    # Check for image data
-                                    if 'data:image' in text.lower():
-                                        print("✓ Contains image data!")
-                                        # Extract image type
-                                        if 'data:image/png' in text.lower():
-                                            print("✓ PNG image detected")
-                                        elif 'data:image/svg' in text.lower():
-                                            print("✓ SVG image detected")
-                                        # Save to file
-                                        import re
-                                        img_match = re.search(r'data:image/([^;]+);base64,([A-Za-z0-9+/=]+)', text, re.IGNORECASE)
-                                        if img_match:
-                                            img_type = img_match.group(1)
-                                            img_data = img_match.group(2)
-                                            filename = f'simple_test_diagram.{img_type}'
-                                            import base64
-                                            with open(filename, 'wb') as f:
-                                                f.write(base64.b64decode(img_data))
-                                            print(f"✓ Saved image to {filename}")
-                                    elif '<svg' in text.lower():
-                                        print("✓ Contains SVG!")
-                                        import re
-                                        svg_match = re.search(r'<svg[^>]*>.*?</svg>', text, re.DOTALL | re.IGNORECASE)
-                                        if svg_match:
-                                            with open('simple_test_diagram.svg', 'w', encoding='utf-8') as f:
-                                                f.write(svg_match.group(0))
-                                            print("✓ Saved SVG to simple_test_diagram.svg")
-                                    else:
-                                        print(f"Preview: {text[:300]}...")
+                for i, item in _iter_text_items(response):
+                    text = item.get('text')
+                    if text is None:
+                        continue
+                    print(f"\nContent {i} (text): {len(text)} chars")
+
+                    # Check for image data
+                    data_image = _DATA_IMAGE_HEAD.search(text)
+                    if data_image:
+                        print("✓ Contains image data!")
+                        # Extract image type
+                        if _DATA_IMAGE_PNG.search(text):
+                            print("✓ PNG image detected")
+                        elif _DATA_IMAGE_SVG.search(text):
+                            print("✓ SVG image detected")
+                        # Save to file
+                        data_url = _extract_data_url(text, data_image.start())
+                        if data_url:
+                            img_type, img_data = data_url
+                            filename = f'simple_test_diagram.{img_type}'
+                            # Decode in 4-aligned chunks so the whole image is never held decoded in memory
+                            try:
+                                with open(filename, 'wb') as f:
+                                    for start in range(0, len(img_data), BASE64_CHUNK_SIZE):
+                                        f.write(binascii.a2b_base64(img_data[start:start + BASE64_CHUNK_SIZE]))
+                                print(f"✓ Saved image to {filename}")
+                                break
+                            except binascii.Error as e:
+                                # Don't leave a truncated image behind
+                                Path(filename).unlink(missing_ok=True)
+                                print(f"⚠ Invalid base64 image data: {e}")
+                    elif _SVG_HEAD.search(text):
+                        print("✓ Contains SVG!")
+                        svg_match = _SVG_RE.search(text)
+                        if svg_match:
+                            payload = svg_match.group(0).encode('utf-8')
+                            # Unbuffered so the encoded SVG goes out in a single write
+                            with open('simple_test_diagram.svg', 'wb', buffering=0) as f:
+                                f.write(payload)
+                            print("✓ Saved SVG to simple_test_diagram.svg")
+                            break
+                    else:
+                        print(f"Preview: {text[:300]}...")
                                         
             except Exception as e:
                 print(f"\n✗ Failed: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        await mcp_client_manager.release_mcp_client()
+                if DEBUG_TRACEBACKS:
+                    traceback.print_exc()
         
         print("\n" + "=" * 80)
         print("Simple diagram test completed!")
@@ -116,8 +161,8 @@ async def test_simple_diagram():
         
     except Exception as e:
         print(f"\n✗ Failed: {e}")
-        import traceback
-        traceback.print_exc()
+        if DEBUG_TRACEBACKS:
+            traceback.print_exc()
         return False
 
 
@@ -15,3 +15,97 @@ backend_dir = project_root / "backend"
 if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
+
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import pytest_asyncio
+
+
+def pytest_addoption(parser):
+    """Add custom pytest options"""
+    parser.addoption(
+        "--test-mcp",
+        action="store_true",
+        default=False,
+        help="Run integration tests with real MCP servers"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip MCP tests if --test-mcp flag is not provided"""
+    if not config.getoption("--test-mcp"):
+        skip_mcp = pytest.mark.skip(reason="need --test-mcp option to run")
+        for item in items:
+            if "mcp" in item.keywords:
+                item.add_marker(skip_mcp)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def diagram_mcp():
+    """Connect to the AWS Diagram MCP server once and share the client across tests"""
+    from services.mcp_client_manager import mcp_client_manager
+
+    wrapper = await mcp_client_manager.get_mcp_client_wrapper(["aws-diagram-server"])
+    async with wrapper as mcp_client:
+        yield mcp_client
+
+
+@pytest.fixture(scope="session")
+def app():
+    """FastAPI app, imported on first use so service-only test modules never load backend.main"""
+    from backend.main import app as _app
+    return _app
+
+
+@pytest.fixture(scope="session")
+def main_module(app):
+    """The imported backend.main module, for patching its globals by object rather than dotted path"""
+    import backend.main
+    return backend.main
+
+
+@pytest.fixture
+def patch_main(main_module, monkeypatch):
+    """Replace a backend.main global with a MagicMock for the duration of a test and return the mock"""
+    def _patch_main(name: str) -> MagicMock:
+        mock = MagicMock()
+        monkeypatch.setattr(main_module, name, mock)
+        return mock
+    return _patch_main
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client(app):
+    """Async client calling the FastAPI app in-process, shared across the test session"""
+    from httpx import AsyncClient, ASGITransport
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as async_client:
+        yield async_client
+
+
+@pytest.fixture
+def make_agent():
+    """Factory for lightweight MCPKnowledgeAgent stand-ins returning a fixed result or raising error"""
+    def _make_agent(result: Optional[Dict[str, Any]] = None, error: Optional[Exception] = None):
+        async def execute(*args, **kwargs):
+            if error is not None:
+                raise error
+            return result
+
+        async def initialize(*args, **kwargs):
+            return None
+
+        return SimpleNamespace(execute=execute, initialize=initialize, conversation_manager=SimpleNamespace())
+    return _make_agent
+
+
+@pytest.fixture
+def mock_orchestrator():
+    """Pre-built MCPEnabledOrchestrator stand-in; tests set execute_all's return value"""
+    orchestrator = AsyncMock()
+    orchestrator.initialize = AsyncMock()
+    orchestrator.execute_all = AsyncMock()
+    return orchestrator
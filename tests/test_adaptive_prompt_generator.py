@@ -145,3 +145,41 @@ class TestAdaptivePromptGenerator:
         assert "Build upon" in prompt or "previous" in prompt.lower()
         assert "conversation continuity" in prompt.lower() or "previous discussion" in prompt.lower()
 
+    
+    def test_base_prompt_reused_across_questions(self):
+        """Test that prompts for the same question type differ only in the question"""
+        question_type = {
+            "research_strategy": "pricing_research",
+            "output_format": "cost_breakdown",
+            "min_sources": 2
+        }
+        
+        first = create_base_prompt("How much does Lambda cost?", question_type)
+        second = create_base_prompt("How much does S3 cost?", question_type)
+        
+        assert first.replace("How much does Lambda cost?", "") == second.replace("How much does S3 cost?", "")
+        assert "Cite at least 2 documentation sources" in first
+        assert "cost_breakdown format" in second
+    
+    def test_follow_up_prompt_tracks_context_changes(self):
+        """Test that cached prompts are keyed on the previous context contents"""
+        question_type = {
+            "research_strategy": "comprehensive_research",
+            "output_format": "detailed_explanation",
+            "min_sources": 3
+        }
+        previous_context = {
+            "question": "What is Lambda?",
+            "summary": "Lambda overview",
+            "services": ["Lambda"],
+            "topics": ["Serverless"]
+        }
+        
+        first = create_adaptive_prompt("Tell me more", question_type, previous_context, is_follow_up=True)
+        previous_context["services"].append("DynamoDB")
+        second = create_adaptive_prompt("Tell me more", question_type, previous_context, is_follow_up=True)
+        
+        assert "Services Discussed: Lambda\n" in first
+        assert "Services Discussed: Lambda, DynamoDB" in second
+        assert create_adaptive_prompt("Tell me more", question_type, previous_context) == \
+            create_base_prompt("Tell me more", question_type)
@@ -5,11 +5,13 @@ Tests for CloudFormation parser service
 import pytest
 from backend.services.cloudformation_parser import (
     parse_cloudformation_template,
+    parse_cloudformation_template_bytes,
     generate_deployment_instructions,
     _clean_template,
     _extract_outputs,
     _extract_parameters,
-    _extract_resources
+    _extract_resources,
+    _extract_key_properties
 )
 
 
@@ -88,6 +90,80 @@ Resources:
         assert result["resource_types"]["AWS::Lambda::Function"] == 2
         assert result["resource_types"]["AWS::S3::Bucket"] == 1
     
+    def test_parse_template_with_intrinsic_functions(self):
+        """Test short-form intrinsics (!Ref, !GetAtt, !Sub) parse to long-form values"""
+        template = """
+AWSTemplateFormatVersion: '2010-09-09'
+Resources:
+  MyBucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: !Sub '${AWS::StackName}-data'
+Outputs:
+  BucketName:
+    Value: !Ref MyBucket
+  BucketArn:
+    Value: !GetAtt MyBucket.Arn
+"""
+        result = parse_cloudformation_template(template)
+        
+        assert result["total_resources"] == 1
+        outputs = {output["key"]: output["value"] for output in result["outputs"]}
+        assert outputs["BucketName"] == {"Ref": "MyBucket"}
+        assert outputs["BucketArn"] == {"Fn::GetAtt": ["MyBucket", "Arn"]}
+    
+    def test_parse_repeated_template_returns_independent_copies(self):
+        """Test cached parses of the same template are equal but not shared"""
+        template = """
+Resources:
+  MyQueue:
+    Type: AWS::SQS::Queue
+"""
+        first = parse_cloudformation_template(template)
+        first["resources"].clear()
+        first["aws_services"].append("Mutated")
+        
+        second = parse_cloudformation_template(template)
+        assert second["total_resources"] == 1
+        assert len(second["resources"]) == 1
+        assert second["aws_services"] == ["SQS"]
+    
+    def test_parse_template_bytes_matches_str(self):
+        """Test bytes input parses like the decoded template, with and without fences"""
+        template = """AWSTemplateFormatVersion: '2010-09-09'
+Resources:
+  MyTable:
+    Type: AWS::DynamoDB::Table
+    Properties:
+      TableName: orders
+"""
+        # Parse the bytes first so the result does not come from the str cache entry
+        result = parse_cloudformation_template_bytes(template.encode("utf-8"))
+        
+        assert result == parse_cloudformation_template(template)
+        fenced = f"```yaml\n{template}```\n".encode("utf-8")
+        assert parse_cloudformation_template_bytes(fenced) == result
+        assert result["aws_services"] == ["DynamoDB"]
+    
+    def test_parse_json_template(self):
+        """Test JSON-format templates parse, bare and in a ```json fence"""
+        template = """{
+  "AWSTemplateFormatVersion": "2010-09-09",
+  "Resources": {
+    "MyTopic": {"Type": "AWS::SNS::Topic"},
+    "MyQueue": {"Type": "AWS::SQS::Queue"}
+  },
+  "Outputs": {
+    "TopicArn": {"Value": {"Ref": "MyTopic"}}
+  }
+}"""
+        result = parse_cloudformation_template(template)
+        
+        assert result["total_resources"] == 2
+        assert result["aws_services"] == ["SNS", "SQS"]
+        assert result["outputs"][0]["value"] == {"Ref": "MyTopic"}
+        assert parse_cloudformation_template(f"```json\n{template}\n```") == result
+    
     def test_extract_outputs(self):
         """Test extracting outputs from template"""
         template_dict = {
@@ -223,4 +299,17 @@ Resources:
         # Check that properties_summary exists
         for resource in result["resources"]:
             assert "properties_summary" in resource
-
+    
+    def test_extract_key_properties(self):
+        """Test cost-relevant properties are extracted for AWS resource types"""
+        rds = _extract_key_properties("AWS::RDS::DBInstance", {"DBInstanceClass": "db.t3.micro", "Engine": "mysql"})
+        assert rds["service"] == "RDS"
+        assert rds["instance_class"] == "db.t3.micro"
+        assert rds["engine"] == "mysql"
+        assert _extract_key_properties("AWS::EC2::Instance", {"InstanceType": "t3.micro"})["instance_type"] == "t3.micro"
+        assert _extract_key_properties("AWS::EC2::VPC", {}) is None
+    
+    def test_extract_key_properties_skips_custom_resources(self):
+        """Test non-AWS types sharing an AWS namespace name get no key properties"""
+        assert _extract_key_properties("Custom::RDS", {"DBInstanceClass": "db.t3.micro"}) is None
+        assert _extract_key_properties("Custom::S3::Bucket", {}) is None
@@ -139,3 +139,21 @@ AWS Lambda is a serverless compute service that runs code in response to events.
         # Should extract Lambda and S3 at minimum
         assert any("Lambda" in s for s in services) or any("lambda" in s.lower() for s in services)
 
+    
+    def test_extract_aws_services_shared_prefixes(self):
+        """Test services sharing a name prefix are matched as whole words"""
+        text = "Deploy with CodePipeline and CodeBuild, cache in ElastiCache, search with Elasticsearch. Codes and VPCs are ignored."
+        services = extract_aws_services(text)
+        
+        assert services == ["CodeBuild", "CodePipeline", "ElastiCache", "Elasticsearch"]
+    
+    def test_extract_analysis_context_repeated_response(self):
+        """Test repeated extraction returns equal, independent context"""
+        response = "## Storage\nAmazon S3 stores objects; DynamoDB stores items."
+        first = extract_analysis_context(response, "Where do I store data?")
+        first["services"].append("Mutated")
+        
+        second = extract_analysis_context(response, "What about items?")
+        assert second["question"] == "What about items?"
+        assert "Mutated" not in second["services"]
+        assert second["topics"] == first["topics"]
@@ -5,8 +5,6 @@ Tests actual functionality with real MCP servers and service integration
 
 import pytest
 import asyncio
-from fastapi.testclient import TestClient
-from backend.main import app
 from backend.services.session_manager import session_manager
 from backend.services.question_classifier import classify_question
 from backend.services.follow_up_detector import detect_follow_up_question
@@ -15,8 +13,6 @@ from backend.services.quality_validator import validate_response_quality
 from backend.services.adaptive_prompt_generator import create_adaptive_prompt
 from backend.services.cloudformation_parser import parse_cloudformation_template
 
-client = TestClient(app)
-
 
 class TestQuestionClassificationIntegration:
     """Test question classification with real logic"""
@@ -283,23 +279,10 @@ class TestSessionManagerIntegration:
 class TestAPIEndpointsIntegration:
     """Test API endpoints with real service functions (minimal mocking)"""
     
-    def test_root_endpoint_real(self):
-        """Test root endpoint without mocks"""
-        response = client.get("/")
-        assert response.status_code == 200
-        data = response.json()
-        assert "message" in data
-        assert "version" in data
-    
-    def test_health_endpoint_real(self):
-        """Test health endpoint without mocks"""
-        response = client.get("/health")
-        assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "healthy"
+    # Root and health endpoints are covered once in test_api.py::TestRootEndpoints
     
     @pytest.mark.asyncio
-    async def test_analyze_endpoint_with_real_classification(self):
+    async def test_analyze_endpoint_with_real_classification(self, client):
         """Test analyze endpoint with real question classification"""
         # This test uses real classification but mocks the AI agent
         # since we can't easily test MCP servers in unit tests
@@ -322,7 +305,7 @@ class TestAPIEndpointsIntegration:
             mock_agent_class.return_value = mock_agent
             
             # Use real session_manager, classify_question, detect_follow_up_question, etc.
-            response = client.post("/analyze-requirements", json={
+            response = await client.post("/analyze-requirements", json={
                 "requirements": "What is AWS Lambda?"
             })
             
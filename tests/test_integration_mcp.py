@@ -5,10 +5,6 @@ Run with: pytest tests/test_integration_mcp.py --test-mcp
 
 import pytest
 import asyncio
-from fastapi.testclient import TestClient
-from backend.main import app
-
-client = TestClient(app)
 
 
 @pytest.mark.integration
@@ -17,9 +13,9 @@ class TestMCPRealIntegration:
     """Integration tests with real MCP servers"""
     
     @pytest.mark.asyncio
-    async def test_brainstorm_with_real_mcp_servers(self):
+    async def test_brainstorm_with_real_mcp_servers(self, client):
         """Test brainstorm endpoint with real MCP servers"""
-        response = client.post("/brainstorm", json={
+        response = await client.post("/brainstorm", json={
             "requirements": "What is AWS Lambda?"
         })
         
@@ -35,9 +31,9 @@ class TestMCPRealIntegration:
         assert len(data["knowledge_response"]) > 50, "Response should be substantial"
     
     @pytest.mark.asyncio
-    async def test_analyze_with_real_mcp_servers(self):
+    async def test_analyze_with_real_mcp_servers(self, client):
         """Test analyze endpoint with real MCP servers"""
-        response = client.post("/analyze-requirements", json={
+        response = await client.post("/analyze-requirements", json={
             "requirements": "I need a serverless API with Lambda and API Gateway"
         })
         
@@ -86,9 +82,9 @@ class TestMCPRealIntegration:
         assert "reasoning" in result
     
     @pytest.mark.asyncio
-    async def test_generate_with_real_mcp_servers(self):
+    async def test_generate_with_real_mcp_servers(self, client):
         """Test generate endpoint with real MCP servers"""
-        response = client.post("/generate", json={
+        response = await client.post("/generate", json={
             "requirements": "Create a Lambda function that processes S3 events"
         })
         
@@ -107,12 +103,12 @@ class TestMCPRealIntegration:
                 assert "total_resources" in data["resources_summary"]
     
     @pytest.mark.asyncio
-    async def test_end_to_end_workflow(self):
+    async def test_end_to_end_workflow(self, client):
         """Test complete workflow: brainstorm -> analyze -> follow-up"""
         from backend.services.session_manager import session_manager
         
         # Step 1: Brainstorm
-        brainstorm_response = client.post("/brainstorm", json={
+        brainstorm_response = await client.post("/brainstorm", json={
             "requirements": "What AWS services do I need for a serverless API?"
         })
         
@@ -129,7 +125,7 @@ class TestMCPRealIntegration:
         
         # Step 2: Analyze (follow-up question)
         # Pass session_id as query parameter
-        analyze_response = client.post(
+        analyze_response = await client.post(
             f"/analyze-requirements?session_id={session_id}",
             json={
                 "requirements": "How do I implement authentication?"
@@ -151,28 +147,43 @@ class TestMCPRealIntegration:
         assert len(session.get("conversation_history", [])) >= 1 or "last_analysis" in session
 
 
-def pytest_addoption(parser):
-    """Add custom pytest options"""
-    parser.addoption(
-        "--test-mcp",
-        action="store_true",
-        default=False,
-        help="Run integration tests with real MCP servers"
-    )
-
 
-def pytest_configure(config):
-    """Configure pytest markers"""
-    config.addinivalue_line(
-        "markers", "mcp: marks tests as requiring MCP servers (deselect with '-m \"not mcp\"')"
-    )
+DIAGRAM_CODE = """from diagrams import Diagram
+from diagrams.aws.compute import Lambda
+from diagrams.aws.database import Dynamodb
+from diagrams.aws.network import APIGateway
 
+with Diagram("Test Serverless Application", show=False):
+    api = APIGateway("API Gateway")
+    function = Lambda("Function")
+    database = Dynamodb("DynamoDB")
+    api >> function >> database"""
 
-def pytest_collection_modifyitems(config, items):
-    """Skip MCP tests if --test-mcp flag is not provided"""
-    if not config.getoption("--test-mcp"):
-        skip_mcp = pytest.mark.skip(reason="need --test-mcp option to run")
-        for item in items:
-            if "mcp" in item.keywords:
-                item.add_marker(skip_mcp)
 
+@pytest.mark.integration
+@pytest.mark.mcp
+class TestDiagramMCPServer:
+    """Diagram MCP server checks sharing one session-scoped connection"""
+    
+    @pytest.mark.asyncio
+    async def test_lists_diagram_tools(self, diagram_mcp):
+        """Test the diagram server advertises its diagram tools"""
+        from services.mcp_client_manager import mcp_client_manager
+        
+        tools = await mcp_client_manager.list_tools(diagram_mcp)
+        tool_names = [getattr(tool, 'tool_name', tool.__class__.__name__) for tool in tools]
+        assert any('diagram' in name.lower() for name in tool_names), f"No diagram tools in {tool_names}"
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("tool_name,arguments", [
+        ("get_diagram_examples", {}),
+        ("generate_diagram", {"code": DIAGRAM_CODE}),
+        ("list_icons", {}),
+    ])
+    async def test_diagram_tool_call(self, diagram_mcp, tool_name, arguments):
+        """Test each diagram tool returns a result"""
+        from services.mcp_client_manager import mcp_client_manager
+        
+        call_tool = mcp_client_manager.get_tool_caller(diagram_mcp)
+        result = await call_tool(tool_name, arguments)
+        assert result is not None
@@ -127,6 +127,21 @@ class TestSessionManager:
         session = self.manager.get_session(session_id)
         assert session is None
     
+    def test_session_limit_evicts_least_recently_accessed(self):
+        """Test the oldest untouched session is evicted once the cap is reached"""
+        manager = SessionManager(max_sessions=2)
+        first = manager.create_session()
+        second = manager.create_session()
+        
+        # Accessing the first session makes the second the eviction candidate
+        assert manager.get_session(first) is not None
+        third = manager.create_session()
+        
+        assert len(manager.sessions) == 2
+        assert manager.get_session(second) is None
+        assert manager.get_session(first) is not None
+        assert manager.get_session(third) is not None
+    
     def test_get_session_stats(self):
         """Test getting session statistics"""
         # Create multiple sessions
@@ -0,0 +1,42 @@
+"""
+Tests for the shared template cache helpers
+"""
+
+from collections import OrderedDict
+
+from backend.services.template_cache import cached_copy, template_digest
+
+
+class TestTemplateCache:
+    """Test digest keys and copy-on-read LRU behaviour"""
+    
+    def test_str_and_bytes_share_digest(self):
+        """Test a template and its UTF-8 bytes map to the same key"""
+        assert template_digest("Resources: {}") == template_digest(b"Resources: {}")
+        assert template_digest("Resources: {}") != template_digest("Outputs: {}")
+    
+    def test_cached_copy_builds_once_and_returns_copies(self):
+        """Test hits skip the builder and mutations never reach the cache"""
+        cache = OrderedDict()
+        calls = []
+        
+        def build():
+            calls.append(1)
+            return {"resources": ["MyBucket"]}
+        
+        first = cached_copy(cache, "key", build, max_size=4)
+        first["resources"].append("Mutated")
+        second = cached_copy(cache, "key", build, max_size=4)
+        
+        assert len(calls) == 1
+        assert second == {"resources": ["MyBucket"]}
+    
+    def test_cached_copy_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted beyond max_size"""
+        cache = OrderedDict()
+        cached_copy(cache, "a", lambda: 1, max_size=2)
+        cached_copy(cache, "b", lambda: 2, max_size=2)
+        cached_copy(cache, "a", lambda: 1, max_size=2)
+        cached_copy(cache, "c", lambda: 3, max_size=2)
+        
+        assert list(cache) == ["a", "c"]